@@ -1,34 +1,38 @@
-from flask import Flask, render_template, request, redirect, url_for, make_response, jsonify
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, make_response, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS, cross_origin
-from models import db, User, ItemListing, ForumPost, ForumComment, ForumLike, ItemLike, ItemOffer
+from models import db, User, ItemListing, ForumPost, ForumComment, ForumLike, ItemLike, ItemOffer, ImageVariant, Blob, OFFER_STATUSES, item_image_url
+from enrichment import attach_like_data
+from pagination import get_page_args, paginate, InvalidCursor
+from streaming import stream_page, MAX_STREAM_PAGE_LIMIT
+from conditional import make_etag, not_modified_response, with_etag, forum_feed_version, forum_post_version, store_feed_version, store_item_version
+from facets import parse_store_filters, apply_store_filters, get_facet_counts, InvalidFilter
+from search import search, decode_search_cursor, rebuild_search_index
+from counters import change_item_like_count, change_post_comment_count, reconcile_counters
+from auth_cache import user_exists, clear_auth_cache, get_auth_cache_stats
+from images import image_response, VARIANT_SIZES
+from blobstore import put_blob, blob_path, remove_unreferenced_blobs, remove_all_unreferenced_blobs, remove_orphan_blob_files, migrate_images_to_blob_store
+from image_variants import add_image_variants, release_image, backfill_image_variants
+from migrations import migrate_database, drop_database
+from datagen import generate_data
+from sqlalchemy.orm import joinedload, contains_eager
 from datetime import datetime, timedelta
 import os
-from google.auth.transport import requests
-from google.oauth2 import id_token
+from db_engine import configure_database, init_engine
+from request_timing import configure_request_timing, init_request_timing
+from metrics import configure_metrics, init_metrics, render_metrics
+from compression import configure_compression, init_compression
+from json_provider import configure_json, init_json
+from offer_state import OfferError
+import offer_state
+from google_login import GoogleTokenVerifier, CertsUnavailable, cert_source_from_env
 import jwt
 from functools import wraps
+import click
 
 
-app = Flask(__name__)
-
-# Configure database
-app.config['CACHE_TYPE'] = 'null' # disable if in production environment
-app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Enable CORS
-
-CORS(
-    app,
-    supports_credentials=True,
-    resources={
-        r"/api/*": {
-            "origins": ["http://localhost:5173", "https://swycle.sccs.swarthmore.edu"],
-        }
-    }
-)
+# All the routes and CLI commands, registered on the app by create_app
+api = Blueprint('api', __name__, cli_group=None)
 
 mock_users = [
     {
@@ -256,8 +260,6 @@ mock_item_offers = [
 ]
 
 
-
-
 def add_mock_data():
     # insert user mock data
     for user_data in mock_users:
@@ -299,7 +301,7 @@ def add_mock_data():
             gender=item["gender"],
             condition=item["condition"],
             category=item["category"],
-            picture_data=picture_data,
+            picture_hash=put_blob(picture_data),
             is_available=item.get("is_available", True)
         )
         db.session.add(new_item)
@@ -307,9 +309,9 @@ def add_mock_data():
 
     # insert item like mock data
     for like in mock_item_likes:
-        user_exists = db.session.query(User.id).filter_by(id=like["user_id"]).first() is not None
+        existing_user = db.session.query(User.id).filter_by(id=like["user_id"]).first() is not None
         item_exists = db.session.query(ItemListing.id).filter_by(id=like["item_id"]).first() is not None
-        if user_exists and item_exists:
+        if existing_user and item_exists:
             item_like = ItemLike(
                 id=like["id"],
                 user_id=like["user_id"],
@@ -329,15 +331,15 @@ def add_mock_data():
         elif post_data["photo_path"]:
             print(f"Warning: Photo file not found for forum post {post_data['id']} at {post_data['photo_path']}. Skipping photo for this post.")
 
-        user_exists = db.session.query(User.id).filter_by(id=post_data["user_id"]).first() is not None
-        if user_exists:
+        existing_user = db.session.query(User.id).filter_by(id=post_data["user_id"]).first() is not None
+        if existing_user:
             new_post = ForumPost(
                 id=post_data["id"],
                 user_id=post_data["user_id"],
                 title=post_data["title"],
                 content=post_data["content"],
                 category=post_data["category"],
-                photo_data=photo_data, 
+                photo_hash=put_blob(photo_data) if photo_data else None,
                 created_at=created_at
             )
             db.session.add(new_post)
@@ -360,34 +362,45 @@ def add_mock_data():
 
     db.session.commit()
 
-    print("Mock data successfully added to the database.")
+    # generate thumbnails for the mock item and forum photos
+    backfill_image_variants()
 
+    # count the mock likes and comments
+    reconcile_counters()
 
+    print("Mock data successfully added to the database.")
 
-# Initialize db to be used with current Flask app
-#initialize using function
-def init_database():
-    with app.app_context():
-        db.init_app(app)
 
-        # Drop any existing tables for a clean start
-        db.drop_all() 
 
-        # Create the database if it doesn't exist
-        # Note: create_all does NOT update tables if they are already in the database. 
-        # If you change a model’s columns, use a migration library like Alembic with Flask-Alembic 
-        # or Flask-Migrate to generate migrations that update the database schema.
-        db.create_all()
+# Brings the database schema up to date (see migrations.py), without touching existing data.
+# With seed=True (or SEED_MOCK_DATA=true), an empty database also gets the mock data
+def init_database(app, seed=None):
+    if seed is None:
+        seed = os.getenv('SEED_MOCK_DATA', 'false').lower() == 'true'
+    with app.app_context():
+        migrate_database()
+        if seed:
+            seed_database()
 
-        # add mock data to the database
-        add_mock_data()
+# Adds the mock data, unless the database already has users
+def seed_database():
+    if User.query.first() is not None:
+        print("Database already has data, not adding mock data.")
+        return
+    add_mock_data()
 
+# Drops everything and starts over with a fresh database, with the mock data
+def reset_database():
+    drop_database()
+    clear_auth_cache()
+    migrate_database()
+    add_mock_data()
 
 
 # Auth helper function to verify and decode JWT tokens
 def decode_access_token(token):
     try:
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
     except ValueError as e:
         return None
     return data
@@ -408,9 +421,8 @@ def validate_authentication():
                 print("ERROR: Invalid token")
                 return make_response(jsonify({"error": "Invalid authentication token"}), 401)
             
-            # Check that the user_id exists in the database
-            user = User.query.filter_by(id=token_data['user_id']).first()
-            if not user:
+            # Check that the user_id exists in the database (cached, see auth_cache.py)
+            if not user_exists(token_data['user_id']):
                 print("ERROR: User not found")
                 return make_response(jsonify({"error": "Authenticated user not found"}), 401)
             
@@ -420,25 +432,43 @@ def validate_authentication():
     return decorator
 
 ## STORE ITEMS 
-@app.route('/api/store-items', methods=['GET'])
+@api.route('/api/store-items', methods=['GET'])
 @validate_authentication()
 def get_store_items(token_data):
     auth_user_id = token_data['user_id']
-    # return all items in order of most recent that are available
-    items = ItemListing.query.order_by(ItemListing.created_at.desc()).filter_by(is_available=True).all()
-    items_list = [item.serialize() for item in items]
-    # also fetch whether the user has liked the item and total like count
-    for item in items_list:
-        item["liked"] = ItemLike.query.filter_by(item_id=item["id"], user_id=token_data["user_id"]).first() is not None
-        item["like_count"] = ItemLike.query.filter_by(item_id=item["id"]).count()
-
-    # NOTE: should probably paginate this in the future, oh well
-    return make_response(jsonify(items_list), 200)
+    try:
+        limit, cursor = get_page_args(max_limit=MAX_STREAM_PAGE_LIMIT)
+        filters = parse_store_filters(request.args)
+    except (InvalidCursor, InvalidFilter) as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    # nothing to send if the client's copy of the page is current, see conditional.py
+    etag = make_etag(store_feed_version(filters, limit, cursor, auth_user_id))
+    not_modified = not_modified_response(etag, private=True)
+    if not_modified:
+        return not_modified
+
+    # facet counts don't change from page to page, so only send them with the first one
+    extra = {} if cursor else {"facets": get_facet_counts(filters)}
+    # stream one page of available items matching the filters, in order of most recent,
+    # with whether the user has liked each item (see streaming.py)
+    query = apply_store_filters(ItemListing.query.filter_by(is_available=True), filters)
+    response = stream_page(
+        query, ItemListing.created_at, ItemListing.id, limit, cursor,
+        lambda items: attach_like_data([item.serialize() for item in items], auth_user_id), extra
+    )
+    return with_etag(response, etag, private=True)
 
-@app.route('/api/store-items/<int:item_id>', methods=['GET'])
+@api.route('/api/store-items/<int:item_id>', methods=['GET'])
 @validate_authentication()
 def get_store_item(token_data, item_id): 
     auth_user_id = token_data['user_id']
+    version = store_item_version(item_id, auth_user_id)
+    etag = make_etag(version)
+    not_modified = not_modified_response(etag, private=True) if version else None
+    if not_modified:
+        return not_modified
+
     # also fetch User data (name, profile picture)
     item = ItemListing.query.filter_by(id=item_id).first()
     if not item:
@@ -454,16 +484,15 @@ def get_store_item(token_data, item_id):
     response["user_profile_picture_url"] = user_data["profile_picture_url"]
 
     # also fetch whether the user has liked the item and total like count
-    response["liked"] = ItemLike.query.filter_by(item_id=item_id, user_id=auth_user_id).first() is not None
-    response["like_count"] = ItemLike.query.filter_by(item_id=item_id).count()
+    attach_like_data([response], auth_user_id)
 
     # also fetch whether the user has made an offer on the item
     response["current_user_made_offer"] = ItemOffer.query.filter_by(item_id=item_id, buyer_id=auth_user_id).first() is not None
 
-    return make_response(jsonify(response), 200)
+    return with_etag(make_response(jsonify(response), 200), etag, private=True)
 
 # USER
-@app.route('/api/user/<int:user_id>', methods=['GET'])
+@api.route('/api/user/<int:user_id>', methods=['GET'])
 @validate_authentication()
 def get_user(token_data, user_id):
     token = request.cookies.get('access_token')
@@ -483,24 +512,27 @@ def get_user(token_data, user_id):
     return make_response(jsonify(user.serialize()), 200)
 
 ## STORE ITEMS BY USER (for profile page)
-@app.route('/api/user/<int:user_id>/store-items', methods=['GET'])
+@api.route('/api/user/<int:user_id>/store-items', methods=['GET'])
 @validate_authentication()
 def get_user_items(token_data, user_id):
     auth_user_id = token_data['user_id']
+    try:
+        limit, cursor = get_page_args()
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
     user = User.query.filter_by(id=user_id).first()
     if not user:
         return make_response(jsonify({"error": "User not found"}), 404)
-    items = ItemListing.query.filter_by(user_id=user_id).all()
+    query = ItemListing.query.filter_by(user_id=user_id)
+    items, next_cursor = paginate(query, ItemListing.created_at, ItemListing.id, limit, cursor)
     items_list = [item.serialize() for item in items]
 
     # also fetch whether the auth has liked the item and total like count
-    for item in items_list:
-        item["liked"] = ItemLike.query.filter_by(item_id=item["id"], user_id=auth_user_id).first() is not None
-        item["like_count"] = ItemLike.query.filter_by(item_id=item["id"]).count()
-    return make_response(jsonify(items_list), 200)
+    attach_like_data(items_list, auth_user_id)
+    return make_response(jsonify({"items": items_list, "next_cursor": next_cursor}), 200)
 
 # UPLOAD STORE ITEM
-@app.route('/api/store-items', methods=['POST'])
+@api.route('/api/store-items', methods=['POST'])
 @validate_authentication()
 def upload_store_item(token_data):
     # verify that the id from the token matches the user_id in the request
@@ -541,12 +573,14 @@ def upload_store_item(token_data):
         size=size,
         condition=condition,
         category=category,
-        picture_data=picture_data
+        picture_hash=put_blob(picture_data)
     )
 
-    # Add to db session and commit
+    # Add to db session (along with resized variants of the picture) and commit
     try:
         db.session.add(new_item)
+        db.session.flush()
+        add_image_variants("item", new_item.id, picture_data)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -555,7 +589,7 @@ def upload_store_item(token_data):
     temp_response = {"message": "Item successfully uploaded!"}
     return make_response(jsonify(temp_response), 201)
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         print("Login request received")
@@ -567,14 +601,13 @@ def login():
 
         # Verify that token is valid via Google
         try:
-            idinfo = id_token.verify_oauth2_token(
-                google_token,
-                requests.Request(),
-                os.getenv("GOOGLE_CLIENT_ID")
-            )
+            idinfo = current_app.extensions['google_token_verifier'].verify(google_token)
         except ValueError:
             print("ERROR: Invalid token")
             return make_response(jsonify({"error": "Invalid Token"}), 400)
+        except CertsUnavailable as e:
+            print(f"ERROR: {e}")
+            return make_response(jsonify({"error": "Could not verify token, try again later"}), 503)
 
         # Check if the user already exists in the database
         user = User.query.filter_by(email=idinfo['email']).first()
@@ -601,7 +634,7 @@ def login():
             'email': user.email,
             'exp': datetime.now() + timedelta(hours=24)
         }
-        jwt_token = jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+        jwt_token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
         # Create a response and set the JWT as an HttpOnly cookie
         # NOTE: we need to update secure and samesite when deploying to production
@@ -626,7 +659,7 @@ def login():
         print(error)
         return make_response(jsonify({"error": str(error)}), 400)
 
-@app.route('/api/logout', methods=['POST', 'OPTIONS'])
+@api.route('/api/logout', methods=['POST', 'OPTIONS'])
 def logout():
     #deletes token cookie from user 
     resp = make_response()
@@ -635,7 +668,7 @@ def logout():
     return resp
 
 # Get the current user's information (aka "me")
-@app.route('/api/me', methods=['GET', 'OPTIONS'])
+@api.route('/api/me', methods=['GET', 'OPTIONS'])
 def me():
     # validate that the JWT exists and is valid
     token = request.cookies.get('access_token')
@@ -643,7 +676,7 @@ def me():
         print("ERROR: No token found")
         return jsonify({"error":"Not authenticated"}), 401
     try:
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         print("ERROR: Token expired")
         return jsonify({"error":"Token expired"}), 401
@@ -655,7 +688,7 @@ def me():
     # return user info
     return jsonify({"user_data": user.serialize()}), 200
 
-@app.route('/api/store-items/<int:item_id>/like', methods=['POST'])
+@api.route('/api/store-items/<int:item_id>/like', methods=['POST'])
 @validate_authentication()
 def like_store_item(token_data, item_id):
     user_id = token_data['user_id']
@@ -669,34 +702,38 @@ def like_store_item(token_data, item_id):
     existing_like = ItemLike.query.filter_by(item_id=item_id, user_id=user_id).first()
     if existing_like:
         db.session.delete(existing_like)
+        change_item_like_count(item_id, -1)
         db.session.commit()
         return make_response(jsonify({"message": "Item unliked successfully"}), 200)
 
     # Otherwise, create a new like
     new_like = ItemLike(item_id=item_id, user_id=user_id)
     db.session.add(new_like)
+    change_item_like_count(item_id, 1)
     db.session.commit()
 
     return make_response(jsonify({"message": "Item liked successfully"}), 200)
 
-@app.route('/api/user/<int:user_id>/liked-items', methods=['GET'])
+@api.route('/api/user/<int:user_id>/liked-items', methods=['GET'])
 @validate_authentication()
 def get_user_likes(token_data, user_id):
     auth_user_id = token_data['user_id']
-    # Fetch all items the user liked in descending order of creation
-    user_likes = ItemLike.query.filter_by(user_id=user_id).order_by(ItemLike.created_at.desc()).all()
-    liked_items_list = []
-    for like in user_likes:
-        item = ItemListing.query.filter_by(id=like.item_id).first()
-        if item:
-            liked_item = item.serialize()
-            # Check if the authenticated user has liked the item
-            liked_item["liked"] = ItemLike.query.filter_by(item_id=item.id, user_id=auth_user_id).first() is not None
-            liked_item["like_count"] = ItemLike.query.filter_by(item_id=item.id).count()
-            liked_items_list.append(liked_item)
-    return make_response(jsonify(liked_items_list), 200)
-
-@app.route('/api/store-items/<int:item_id>', methods=['DELETE'])
+    try:
+        limit, cursor = get_page_args(max_limit=MAX_STREAM_PAGE_LIMIT)
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    # Stream one page of items the user liked in descending order of when they were liked
+    query = ItemListing.query\
+        .join(ItemLike, ItemLike.item_id == ItemListing.id)\
+        .filter(ItemLike.user_id == user_id)
+    # Check if the authenticated user has liked each item, batch by batch
+    return stream_page(
+        query, ItemLike.created_at, ItemLike.id, limit, cursor,
+        lambda items: attach_like_data([item.serialize() for item in items], auth_user_id)
+    )
+
+@api.route('/api/store-items/<int:item_id>', methods=['DELETE'])
 @validate_authentication()
 def delete_store_item(token_data, item_id):
     auth_user_id = token_data['user_id']
@@ -709,13 +746,15 @@ def delete_store_item(token_data, item_id):
     if item.user_id != auth_user_id:
         return make_response(jsonify({"error": "You do not have permission to delete this item"}), 403)
 
-    # Delete the item
+    # Delete the item and release its image (and variants) from the blob store
+    released_hashes = release_image("item", item_id, item.picture_hash)
     db.session.delete(item)
     db.session.commit()
+    remove_unreferenced_blobs(released_hashes)
 
     return make_response(jsonify({"message": "Item deleted successfully"}), 200)
 
-@app.route('/api/user/<int:user_id>/bio', methods=['PUT'])
+@api.route('/api/user/<int:user_id>/bio', methods=['PUT'])
 @validate_authentication()
 def update_user_bio(token_data, user_id):
     auth_user_id = token_data['user_id']
@@ -739,7 +778,7 @@ def update_user_bio(token_data, user_id):
     return make_response(jsonify({"message": "Bio updated successfully"}), 200)
 
 # Offers
-@app.route('/api/store-items/<int:item_id>/offer', methods=['POST'])
+@api.route('/api/store-items/<int:item_id>/offer', methods=['POST'])
 @validate_authentication()
 def make_offer(token_data, item_id):
     buyer_id = token_data['user_id']
@@ -772,109 +811,99 @@ def make_offer(token_data, item_id):
 
     return make_response(jsonify({"message": "Offer made successfully"}), 200)
 
-@app.route('/api/user/<int:user_id>/offers-made', methods=['GET'])
+# One page of the offers a user made (role "buyer") or received (role "seller"), most recent first,
+# optionally only those with one of the given statuses.
+# The item and the other party of each offer are joined into the same query, and only the columns
+# used in the response are read, so a page is a single query.
+def get_offer_page(role, user_id, statuses, limit, cursor):
+    own_column, counterparty = {
+        "buyer": (ItemOffer.buyer_id, ItemOffer.seller),
+        "seller": (ItemOffer.seller_id, ItemOffer.buyer),
+    }[role]
+    query = ItemOffer.query\
+        .join(ItemOffer.item)\
+        .join(counterparty)\
+        .options(
+            contains_eager(ItemOffer.item).load_only(ItemListing.title, ItemListing.price, ItemListing.picture_hash),
+            contains_eager(counterparty).load_only(User.name, User.email, User.profile_picture_url),
+        )\
+        .filter(own_column == user_id)
+    if statuses:
+        query = query.filter(ItemOffer.status.in_(statuses))
+    return paginate(query, ItemOffer.created_at, ItemOffer.id, limit, cursor)
+
+def get_offer_page_args():
+    statuses = request.args.getlist('status')
+    for status in statuses:
+        if status not in OFFER_STATUSES:
+            raise InvalidFilter(f"Invalid status: {status}")
+    limit, cursor = get_page_args()
+    return statuses, limit, cursor
+
+def serialize_offer(offer, counterparty_role, counterparty):
+    offer_data = offer.serialize()
+    offer_data["item_title"] = offer.item.title
+    offer_data["item_price"] = offer.item.price
+    offer_data["item_picture_url"] = item_image_url(offer.item_id, offer.item.picture_hash)
+    offer_data[f"{counterparty_role}_name"] = counterparty.name
+    offer_data[f"{counterparty_role}_profile_picture_url"] = counterparty.profile_picture_url
+    # If offer is accepted, add the other party's contact information, otherwise leave it blank
+    offer_data[f"{counterparty_role}_contact"] = counterparty.email if offer.status == "Accepted" else ""
+    return offer_data
+
+@api.route('/api/user/<int:user_id>/offers-made', methods=['GET'])
 @validate_authentication()
 def get_user_offers(token_data, user_id):
     buyer_id = token_data['user_id']
     # Check if the authenticated user is the owner of the profile
     if buyer_id != user_id:
         return make_response(jsonify({"error": "You do not have permission to view this user's offers"}), 403)
-    
-
-    # Fetch all offers made by the user
-    offers = ItemOffer.query.filter_by(buyer_id=buyer_id).all()
-    offers_list = []
-
-    for offer in offers:
-        offer_data = offer.serialize()
-        # Fetch the item associated with the offer
-        item = ItemListing.query.filter_by(id=offer.item_id).first()
-        if not item:
-            continue
-        item_data = item.serialize()
-        seller_id = item.user_id
-
-        # Fetch the user who listed the item
-        item_seller = User.query.filter_by(id=seller_id).first()
-        if not item_seller:
-            continue
-        item_seller_data = item_seller.serialize()
-
-        # Add item and seller information to the offer data
-        offer_data["item_title"] = item_data["title"]
-        offer_data["item_price"] = item_data["price"]
-        offer_data["item_picture_data"] = item_data["picture_data"]
-        offer_data["seller_name"] = item_seller_data["name"]
-        offer_data["seller_profile_picture_url"] = item_seller_data["profile_picture_url"]
-
-        # If offer is accepted, add the seller's contact information, otherwise leave it blank
-        offer_data["seller_contact"] = item_seller_data["email"] if offer.status == "Accepted" else ""
-        offers_list.append(offer_data)
-
-        # Also add completion status
-        offer_data["buyer_completed"] = offer.buyer_completed
-        offer_data["seller_completed"] = offer.seller_completed
+    try:
+        statuses, limit, cursor = get_offer_page_args()
+    except (InvalidCursor, InvalidFilter) as e:
+        return make_response(jsonify({"error": str(e)}), 400)
 
-    return make_response(jsonify(offers_list), 200)
+    # Fetch the offers made by the user, with item and seller information
+    offers, next_cursor = get_offer_page("buyer", buyer_id, statuses, limit, cursor)
+    offers_list = [serialize_offer(offer, "seller", offer.seller) for offer in offers]
+    return make_response(jsonify({"items": offers_list, "next_cursor": next_cursor}), 200)
 
-@app.route('/api/user/<int:user_id>/offers-received', methods=['GET'])
+@api.route('/api/user/<int:user_id>/offers-received', methods=['GET'])
 @validate_authentication()
 def get_user_received_offers(token_data, user_id):
     auth_user_id = token_data['user_id']
     # Check if the authenticated user is the owner of the profile
     if auth_user_id != user_id:
         return make_response(jsonify({"error": "You do not have permission to view this user's offers"}), 403)
-    # Fetch all offers received by the user
-    offers = ItemOffer.query.filter_by(seller_id=user_id).all()
-    offers_list = []
-    for offer in offers:
-        offer_data = offer.serialize()
-        # Fetch the item associated with the offer
-        item = ItemListing.query.filter_by(id=offer.item_id).first()
-        if not item:
-            continue
-        item_data = item.serialize()
-
-        # Fetch the user who made the offer
-        buyer = User.query.filter_by(id=offer.buyer_id).first()
-        if not buyer:
-            continue
-        buyer_data = buyer.serialize()
-
-        # Add item and buyer information to the offer data
-        offer_data["item_title"] = item_data["title"]
-        offer_data["item_price"] = item_data["price"]
-        offer_data["item_picture_data"] = item_data["picture_data"]
-        offer_data["buyer_name"] = buyer_data["name"]
-        offer_data["buyer_profile_picture_url"] = buyer_data["profile_picture_url"]
+    try:
+        statuses, limit, cursor = get_offer_page_args()
+    except (InvalidCursor, InvalidFilter) as e:
+        return make_response(jsonify({"error": str(e)}), 400)
 
-        # If offer is accepted, add the buyer's contact information, otherwise leave it blank
-        offer_data["buyer_contact"] = buyer_data["email"] if offer.status == "Accepted" else ""
+    # Fetch the offers received by the user, with item and buyer information
+    offers, next_cursor = get_offer_page("seller", user_id, statuses, limit, cursor)
+    offers_list = [serialize_offer(offer, "buyer", offer.buyer) for offer in offers]
+    return make_response(jsonify({"items": offers_list, "next_cursor": next_cursor}), 200)
 
-        # Also add completion status
-        offer_data["buyer_completed"] = offer.buyer_completed
-        offer_data["seller_completed"] = offer.seller_completed
+# Offer status changes go through offer_state.py. Clients may send the offer's "version" in the
+# body, and get a 409 if the offer changed since they loaded it
+def get_offer_version():
+    return (request.get_json(silent=True) or {}).get("version")
 
-        offers_list.append(offer_data)
-    
-    return make_response(jsonify(offers_list), 200)
+def offer_error_response(error):
+    db.session.rollback()
+    return make_response(jsonify({"error": str(error)}), error.status_code)
 
 # Endpoint for seller to accept an offer
-@app.route('/api/offers/<int:offer_id>/accept', methods=['PUT'])
+@api.route('/api/offers/<int:offer_id>/accept', methods=['PUT'])
 @validate_authentication()
 def accept_offer(token_data, offer_id):
     auth_user_id = token_data['user_id']
-    # Check if the authenticated user is the seller of the offer
-    offer = ItemOffer.query.filter_by(id=offer_id, seller_id=auth_user_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found or you do not have permission to accept this offer"}), 403)
-    
-    # Check that the offer is still pending
-    if offer.status != "Pending":
-        return make_response(jsonify({"error": "Offer has already been accepted or declined"}), 400)
-
-    # Update the offer status to accepted
-    offer.status = "Accepted"
+    # Only the seller can accept, and only a pending offer
+    try:
+        offer = offer_state.accept_offer(offer_id, auth_user_id, get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
 
     # Get the contact information of the buyer
@@ -885,159 +914,232 @@ def accept_offer(token_data, offer_id):
     return make_response(jsonify({"message": "Offer accepted successfully", "buyer_contact": buyer.email}), 200)
 
 # Endpoint for seller to decline an offer
-@app.route('/api/offers/<int:offer_id>/decline', methods=['PUT'])
+@api.route('/api/offers/<int:offer_id>/decline', methods=['PUT'])
 @validate_authentication()
 def decline_offer(token_data, offer_id):
     auth_user_id = token_data['user_id']
-    # Check if the authenticated user is the seller of the offer
-    offer = ItemOffer.query.filter_by(id=offer_id, seller_id=auth_user_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found or you do not have permission to decline this offer"}), 403)
-    
-    # Check that the offer is still pending
-    if offer.status != "Pending":
-        return make_response(jsonify({"error": "Offer has already been accepted or declined"}), 400)
-
-    # Update the offer status to declined
-    offer.status = "Declined"
+    # Only the seller can decline, and only a pending offer
+    try:
+        offer_state.decline_offer(offer_id, auth_user_id, get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
 
     return make_response(jsonify({"message": "Offer declined successfully"}), 200)
 
 # Endpoint for buyer to mark offer as complete
-@app.route('/api/offers/<int:offer_id>/complete-buyer', methods=['PUT'])
+@api.route('/api/offers/<int:offer_id>/complete-buyer', methods=['PUT'])
 @validate_authentication()
 def complete_offer_buyer(token_data, offer_id):
     user_id = token_data['user_id']
-    # must be the buyer
-    offer = ItemOffer.query.filter_by(id=offer_id, buyer_id=user_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found or you are not the buyer"}), 403)
-
-    if offer.buyer_completed:
-        return make_response(jsonify({"message": "Buyer already marked as complete"}), 400)
-
-    offer.buyer_completed = True
-
-    # if seller already did theirs, finalize
-    if offer.seller_completed:
-        offer.status = "Completed"
-        offer.item.is_available = False
-
-    # for all other offers to this item, set them to "Declined"
-    other_offers = ItemOffer.query.filter_by(item_id=offer.item_id, status="Pending").all()
-    for offer in other_offers:
-        offer.status = "Declined"
-
+    try:
+        offer_state.complete_offer(offer_id, user_id, "buyer", get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
 
     return make_response(jsonify({"message": "Buyer completion recorded"}), 200)
 
 # Endpoint for seller to mark offer as complete
-@app.route('/api/offers/<int:offer_id>/complete-seller', methods=['PUT'])
+@api.route('/api/offers/<int:offer_id>/complete-seller', methods=['PUT'])
 @validate_authentication()
 def complete_offer_seller(token_data, offer_id):
     user_id = token_data['user_id']
-    # must be the seller
-    offer = ItemOffer.query.filter_by(id=offer_id, seller_id=user_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found or you are not the seller"}), 403)
-
-    if offer.seller_completed:
-        return make_response(jsonify({"message": "Seller already marked as complete"}), 400)
-
-    offer.seller_completed = True
-
-    # if buyer already did theirs, finalize
-    if offer.buyer_completed:
-        offer.status = "Completed"
-        offer.item.is_available = False
-
-    # for all other offers to this item, set them to "Declined"
-    other_offers = ItemOffer.query.filter_by(item_id=offer.item_id, status="Pending").all()
-    for offer in other_offers:
-        offer.status = "Declined"
-
+    try:
+        offer_state.complete_offer(offer_id, user_id, "seller", get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
+
     return make_response(jsonify({"message": "Seller completion recorded"}), 200)
 
 # Endpoint for buyer to cancel pending offer
-@app.route('/api/offers/<int:offer_id>/delete-pending', methods=['DELETE'])
+@api.route('/api/offers/<int:offer_id>/delete-pending', methods=['DELETE'])
 @validate_authentication()
 def cancel_offer_pending(token_data, offer_id):
     auth_user_id = token_data['user_id']
-    # Check if the authenticated user is the buyer of the offer
-    offer = ItemOffer.query.filter_by(id=offer_id, buyer_id=auth_user_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found or you do not have permission to decline this offer"}), 403)
-    
-    # Check that the offer is still pending
-    if offer.status != "Pending":
-        return make_response(jsonify({"error": "Offer has already been accepted or declined"}), 400)
-    
-    # Delete the offer
-    db.session.delete(offer)
+    # Only the buyer can withdraw, and only a pending offer
+    try:
+        offer_state.withdraw_offer(offer_id, auth_user_id, get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
 
     return make_response(jsonify({"message": "Offer complete successfully"}), 200)
 
 # Endpoint for buyer/seller to cancel accepted offer
-@app.route('/api/offers/<offer_id>/cancel-accepted', methods=['PUT'])
+@api.route('/api/offers/<int:offer_id>/cancel-accepted', methods=['PUT'])
 @validate_authentication()
 def cancel_offer_accepted(token_data, offer_id):
     auth_user_id = token_data['user_id']
-    # Check if the authenticated user is the buyer or seller of the offer
-    offer = ItemOffer.query.filter_by(id=offer_id).first()
-    if not offer:
-        return make_response(jsonify({"error": "Offer not found"}), 404)
-
-    if offer.seller_id != auth_user_id and offer.buyer_id != auth_user_id:
-        return make_response(jsonify({"error": "You do not have permission to cancel this offer"}), 403)
-
-    # Set the offer status to "Cancelled"
-    offer.status = "Cancelled"
-
-    # Reset the completion status
-    offer.buyer_completed = False
-    offer.seller_completed = False
+    # Either party can cancel; this also resets the completion status
+    try:
+        offer_state.cancel_offer(offer_id, auth_user_id, get_offer_version())
+    except OfferError as e:
+        return offer_error_response(e)
     db.session.commit()
 
     return make_response(jsonify({"message": "Offer cancelled successfully"}), 200)
 
-
-@app.route('/api/forum/posts', methods=['GET'])
+# SEARCH
+# Full-text search over available store items and forum posts, best matches first.
+# ?type=items or ?type=posts limits the search to one of them
+@api.route('/api/search', methods=['GET'])
+@validate_authentication()
+def search_all(token_data):
+    query = request.args.get('q', '').strip()
+    if not query:
+        return make_response(jsonify({"error": "Search query is required"}), 400)
+    result_type = request.args.get('type', 'all')
+    if result_type not in ('all', 'items', 'posts'):
+        return make_response(jsonify({"error": f"Invalid type: {result_type}"}), 400)
+    try:
+        limit, cursor = get_page_args(decode=decode_search_cursor)
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    results, next_cursor = search(
+        query,
+        limit,
+        cursor,
+        include_items=result_type in ('all', 'items'),
+        include_posts=result_type in ('all', 'posts'),
+    )
+    return make_response(jsonify({"items": results, "next_cursor": next_cursor}), 200)
+
+# IMAGES
+# Raw image bytes for item listings and forum posts, so JSON payloads only carry URLs.
+# ?size=thumb|card|full returns a resized variant, no size returns the original upload.
+# Images are streamed from the blob store, with the blob hash as their ETag.
+# The URLs in payloads end with the hash of the original (see item_image_url), and a URL whose hash
+# is no longer the owner's image is a 404, so those can be cached for good. URLs without the hash
+# always get the current image, revalidated with the ETag.
+def get_image_blob(owner_type, owner_id, owner_model, original_hash_column, original_hash=None):
+    size = request.args.get('size')
+    if size:
+        query = Blob.query\
+            .join(ImageVariant, ImageVariant.blob_hash == Blob.hash)\
+            .filter(ImageVariant.owner_type == owner_type, ImageVariant.owner_id == owner_id, ImageVariant.size == size)
+        if original_hash:
+            query = query.join(owner_model, owner_model.id == ImageVariant.owner_id)\
+                .filter(original_hash_column == original_hash)
+        blob = query.first()
+        if blob:
+            return blob
+    # fall back to the original if there's no size or the variant couldn't be generated
+    query = Blob.query\
+        .join(owner_model, original_hash_column == Blob.hash)\
+        .filter(owner_model.id == owner_id)
+    if original_hash:
+        query = query.filter(original_hash_column == original_hash)
+    return query.first()
+
+@api.route('/api/images/item/<int:item_id>', methods=['GET'])
+@api.route('/api/images/item/<int:item_id>/<picture_hash>', methods=['GET'])
+@validate_authentication()
+def get_item_image(token_data, item_id, picture_hash=None):
+    size = request.args.get('size')
+    if size and size not in VARIANT_SIZES:
+        return make_response(jsonify({"error": f"Invalid size: {size}"}), 400)
+
+    blob = get_image_blob("item", item_id, ItemListing, ItemListing.picture_hash, picture_hash)
+    if not blob:
+        return make_response(jsonify({"error": "Image not found"}), 404)
+    return image_response(blob_path(blob.hash), blob.hash, blob.content_type, private=True, immutable=picture_hash is not None)
+
+@api.route('/api/images/post/<int:post_id>', methods=['GET'])
+@api.route('/api/images/post/<int:post_id>/<photo_hash>', methods=['GET'])
+def get_post_image(post_id, photo_hash=None):
+    size = request.args.get('size')
+    if size and size not in VARIANT_SIZES:
+        return make_response(jsonify({"error": f"Invalid size: {size}"}), 400)
+
+    blob = get_image_blob("post", post_id, ForumPost, ForumPost.photo_hash, photo_hash)
+    if not blob:
+        return make_response(jsonify({"error": "Image not found"}), 404)
+    return image_response(blob_path(blob.hash), blob.hash, blob.content_type, immutable=photo_hash is not None)
+
+
+@api.route('/api/forum/posts', methods=['GET'])
 def get_forum_posts():
     try:
-        posts = ForumPost.query.order_by(ForumPost.created_at.desc()).all()
-        posts_list = [post.serialize() for post in posts]
-        return jsonify(posts_list), 200
+        limit, cursor = get_page_args(max_limit=MAX_STREAM_PAGE_LIMIT)
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    try:
+        # one page of posts, most recent first, with their authors loaded in the same query
+        # (comment and like counts are columns on the post, see counters.py)
+        categories = request.args.getlist('category')
+        # nothing to send if the client's copy of the page is current, see conditional.py
+        etag = make_etag(forum_feed_version(categories, limit, cursor))
+        not_modified = not_modified_response(etag, private=False)
+        if not_modified:
+            return not_modified
+
+        query = ForumPost.query.options(joinedload(ForumPost.author))
+        if categories:
+            query = query.filter(ForumPost.category.in_(categories))
+        response = stream_page(
+            query, ForumPost.created_at, ForumPost.id, limit, cursor, lambda posts: [post.serialize() for post in posts]
+        )
+        return with_etag(response, etag, private=False)
     except Exception as e:
         print(f"Error fetching forum posts: {e}")
         return jsonify({"error": "An error occurred while fetching forum posts"}), 500
 
 
-@app.route('/api/forum/posts/<int:post_id>', methods=['GET'])
+# One page of a post's comments, newest first, with the commenters loaded in the same query
+def get_comment_page(post_id, limit, cursor):
+    query = ForumComment.query\
+        .options(joinedload(ForumComment.commenter))\
+        .filter_by(forum_post_id=post_id)
+    comments, next_cursor = paginate(query, ForumComment.created_at, ForumComment.id, limit, cursor)
+    return [c.serialize() for c in comments], next_cursor
+
+@api.route('/api/forum/posts/<int:post_id>', methods=['GET'])
 def get_single_forum_post(post_id):
     try:
-        post = ForumPost.query.get(post_id) 
+        limit, cursor = get_page_args()
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    try:
+        version = forum_post_version(post_id)
+        etag = make_etag(version)
+        not_modified = not_modified_response(etag, private=False) if version else None
+        if not_modified:
+            return not_modified
+
+        post = ForumPost.query.options(joinedload(ForumPost.author)).filter_by(id=post_id).first()
         if not post:
             return jsonify({"error": "Forum post not found"}), 404
 
         post_data = post.serialize()
 
-        comments = ForumComment.query\
-        .filter_by(forum_post_id=post_id)\
-        .order_by(ForumComment.created_at.desc())\
-        .all()
-        post_data["comments"] = [c.serialize() for c in comments]
+        # only the first page of comments, the rest come from /api/forum/posts/<post_id>/comments
+        post_data["comments"], post_data["comments_next_cursor"] = get_comment_page(post_id, limit, cursor)
 
-        return jsonify(post_data), 200
+        return with_etag(make_response(jsonify(post_data), 200), etag, private=False)
     except Exception as e:
         print(f"Error fetching single forum post {post_id}: {e}")
         return jsonify({"error": "An error occurred while fetching the forum post"}), 500
 
+@api.route('/api/forum/posts/<int:post_id>/comments', methods=['GET'])
+def get_forum_post_comments(post_id):
+    try:
+        limit, cursor = get_page_args()
+    except InvalidCursor as e:
+        return make_response(jsonify({"error": str(e)}), 400)
+
+    if db.session.query(ForumPost.id).filter_by(id=post_id).first() is None:
+        return jsonify({"error": "Forum post not found"}), 404
 
-@app.route('/api/forum/posts', methods=['POST'])
+    comments, next_cursor = get_comment_page(post_id, limit, cursor)
+    return jsonify({"items": comments, "next_cursor": next_cursor}), 200
+
+
+@api.route('/api/forum/posts', methods=['POST'])
 @validate_authentication() 
 def create_forum_post(token_data):
     user_id = token_data['user_id']
@@ -1066,10 +1168,13 @@ def create_forum_post(token_data):
             content=content,
             user_id=user_id,
             category=category, 
-            photo_data=photo_data 
+            photo_hash=put_blob(photo_data) if photo_data else None
         )
 
         db.session.add(new_post)
+        if photo_data:
+            db.session.flush()
+            add_image_variants("post", new_post.id, photo_data)
         db.session.commit()
 
         return jsonify(new_post.serialize()), 201
@@ -1079,7 +1184,7 @@ def create_forum_post(token_data):
         print(f"Error creating forum post: {e}") 
         return jsonify({"error": "An error occurred while creating the forum post"}), 500
     
-@app.route('/api/forum/posts/<int:post_id>/comments', methods=['POST'])
+@api.route('/api/forum/posts/<int:post_id>/comments', methods=['POST'])
 @validate_authentication()
 def create_comment(token_data, post_id):
     user_id = token_data['user_id']
@@ -1088,6 +1193,11 @@ def create_comment(token_data, post_id):
     if not content:
         return jsonify({"error": "Content is required"}), 400
 
+    # bump the post's comment count, which also tells us whether the post exists
+    if not change_post_comment_count(post_id, 1):
+        db.session.rollback()
+        return jsonify({"error": "Forum post not found"}), 404
+
     new_comment = ForumComment(
         forum_post_id=post_id,
         user_id=user_id,
@@ -1097,11 +1207,15 @@ def create_comment(token_data, post_id):
     db.session.commit()
     return jsonify(new_comment.serialize()), 201
 
-@app.route('/api/user/<int:user_id>/forum-posts', methods=['GET'])
+@api.route('/api/user/<int:user_id>/forum-posts', methods=['GET'])
 @validate_authentication()
 def get_user_forum_posts(token_data, user_id):
     # Fetch all forum posts made by the user
-    posts = ForumPost.query.filter_by(user_id=user_id).order_by(ForumPost.created_at.desc()).all()
+    posts = ForumPost.query\
+        .options(joinedload(ForumPost.author))\
+        .filter_by(user_id=user_id)\
+        .order_by(ForumPost.created_at.desc())\
+        .all()
     posts_list = [post.serialize() for post in posts]
     return make_response(jsonify(posts_list), 200)
 
@@ -1111,7 +1225,7 @@ def get_user_forum_posts(token_data, user_id):
 # 3) total number of items bought
 # 4) total number of item likes received
 # 5) total number of forums posts made
-@app.route('/api/user/<int:user_id>/stats', methods=['GET'])
+@api.route('/api/user/<int:user_id>/stats', methods=['GET'])
 @validate_authentication()
 def get_user_stats(token_data, user_id):
     # Fetch stats
@@ -1135,7 +1249,7 @@ def get_user_stats(token_data, user_id):
 
     return make_response(jsonify(stats), 200)
 
-@app.route('/api/forum/posts/<int:forum_id>', methods=['DELETE'])
+@api.route('/api/forum/posts/<int:forum_id>', methods=['DELETE'])
 @validate_authentication()
 def delete_forum_post(token_data, forum_id):
     user_id = token_data['user_id']
@@ -1147,14 +1261,16 @@ def delete_forum_post(token_data, forum_id):
     #delete the comments associated with the post first
     ForumComment.query.filter_by(forum_post_id=forum_id).delete()
 
-    # Delete the post
+    # Delete the post and release its photo (and variants) from the blob store
+    released_hashes = release_image("post", forum_id, post.photo_hash)
     db.session.delete(post)
     db.session.commit()
+    remove_unreferenced_blobs(released_hashes)
 
     return make_response(jsonify({"message": "Forum post deleted successfully"}), 200)
 
 
-@app.route('/api/forum/comments/<int:comment_id>', methods=['DELETE'])
+@api.route('/api/forum/comments/<int:comment_id>', methods=['DELETE'])
 @validate_authentication()
 def delete_forum_comment(token_data, comment_id):
     user_id = token_data['user_id']
@@ -1163,8 +1279,9 @@ def delete_forum_comment(token_data, comment_id):
     if not comment:
         return make_response(jsonify({"error": "Comment not found or you do not have permission to delete this comment"}), 403)
 
-    # Delete the post
+    # Delete the comment
     db.session.delete(comment)
+    change_post_comment_count(comment.forum_post_id, -1)
     db.session.commit()
 
     return make_response(jsonify({"message": "Forum post deleted successfully"}), 200)
@@ -1172,11 +1289,141 @@ def delete_forum_comment(token_data, comment_id):
 
 
 
-@app.route('/api/hello', methods=['GET'])
+@api.cli.command('migrate-db')
+def migrate_db_command():
+    """Upgrade the database schema to the latest version."""
+    if not migrate_database():
+        print("Database is up to date.")
+
+
+@api.cli.command('seed')
+@click.option('--reset', is_flag=True, help='Drop all tables and data first.')
+def seed_command(reset):
+    """Add the mock data to an empty database."""
+    if reset:
+        click.confirm('This deletes all data in the database. Continue?', abort=True)
+        reset_database()
+    else:
+        migrate_database()
+        seed_database()
+
+
+@api.cli.command('migrate-images')
+def migrate_images_command():
+    """Move images stored in the database into the blob store."""
+    migrate_images_to_blob_store()
+    # databases from before the blob store may also be missing the image_variant table
+    db.create_all()
+    backfill_image_variants()
+
+
+@api.cli.command('gc-blobs')
+def gc_blobs_command():
+    """Delete unreferenced blobs, and blob files that have no blob row."""
+    print(f"Deleted {remove_all_unreferenced_blobs()} unreferenced blobs.")
+    print(f"Removed {remove_orphan_blob_files()} blob files with no blob row.")
+
+
+@api.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the full-text search tables if needed and re-index all listings and posts."""
+    rebuild_search_index()
+
+
+@api.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Recompute the like and comment counts of every listing and post."""
+    reconcile_counters()
+
+
+@api.cli.command('generate-data')
+@click.option('--users', default=10000, show_default=True)
+@click.option('--listings', default=200000, show_default=True)
+@click.option('--likes', default=2000000, show_default=True)
+@click.option('--offers', default=500000, show_default=True)
+@click.option('--posts', default=100000, show_default=True)
+@click.option('--comments', default=1000000, show_default=True)
+@click.option('--seed', type=int, default=None, help='Random seed, for a reproducible dataset.')
+def generate_data_command(users, listings, likes, offers, posts, comments, seed):
+    """Add a large synthetic dataset, for load and scale testing."""
+    migrate_database()
+    generate_data(users=users, listings=listings, likes=likes, offers=offers, posts=posts, comments=comments, seed=seed)
+    clear_auth_cache()
+
+
+@api.route('/api/hello', methods=['GET'])
 def hello():
     return jsonify({"message": "Hello, World!"}), 200
 
+# Hit/miss counters of the in-process caches (per worker process)
+@api.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"auth_user_cache": get_auth_cache_stats()}), 200
+
+# Request, database and cache metrics of all worker processes, in the Prometheus text format
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    if not current_app.config.get('METRICS'):
+        return make_response(jsonify({"error": "Metrics are turned off"}), 404)
+    body, content_type = render_metrics()
+    return make_response(body, 200, {"Content-Type": content_type})
+
+
+
+# Builds the Flask app. `config` overrides the defaults below (e.g. a different
+# SQLALCHEMY_DATABASE_URI for tests), which are read from the environment
+def create_app(config=None):
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['CACHE_TYPE'] = 'null' # disable if in production environment
+    app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Directory where uploaded images are stored (see blobstore.py)
+    app.config['BLOB_STORE_DIR'] = os.getenv('BLOB_STORE_DIR', os.path.join(app.instance_path, 'blobs'))
+    app.config.update(config or {})
+    # DATABASE_URL overrides the default sqlite:///database.db, see db_engine.py for the SQLite settings
+    configure_database(app)
+    # REQUEST_TIMING=true adds Server-Timing headers and logs slow requests, see request_timing.py
+    configure_request_timing(app)
+    # Prometheus metrics at /api/metrics, on unless METRICS=false, see metrics.py
+    configure_metrics(app)
+    # gzip/brotli for /api/* responses, on unless COMPRESSION=false, see compression.py
+    configure_compression(app)
+    # orjson for jsonify if installed, unless JSON_PROVIDER=json, see json_provider.py
+    configure_json(app)
+    init_json(app)
+
+    # Initialize db to be used with current Flask app
+    db.init_app(app)
+    init_engine(app)
+    init_request_timing(app)
+    init_metrics(app)
+    # registered last so that it runs first: the hooks above see the compressed response
+    init_compression(app)
+
+    # Verifies Google ID tokens on login, reusing one connection pool and cached certs (see google_login.py)
+    app.extensions['google_token_verifier'] = GoogleTokenVerifier(
+        os.getenv("GOOGLE_CLIENT_ID"), cert_source_from_env(os.environ)
+    )
+
+    # Enable CORS
+    CORS(
+        app,
+        supports_credentials=True,
+        resources={
+            r"/api/*": {
+                "origins": ["http://localhost:5173", "https://swycle.sccs.swarthmore.edu"],
+            }
+        }
+    )
+
+    app.register_blueprint(api)
+    return app
+
 
+# Development server. In production the app is served by gunicorn, see wsgi.py
 if __name__ == '__main__':
-    init_database()
-    app.run(host="0.0.0.0", port="5001", debug=True)
\ No newline at end of file
+    app = create_app()
+    init_database(app)
+    app.run(host="0.0.0.0", port="5001", debug=True)
@@ -0,0 +1,63 @@
+import os
+import threading
+from cachetools import TTLCache
+from sqlalchemy import event
+from models import db, User
+from metrics import record_cache_lookup
+
+# Cache of user ids known to exist, used by validate_authentication so that checking the user
+# behind a valid token doesn't query the database on every request.
+# Only users that exist are cached (a new user is found as soon as they're created), and entries
+# expire after AUTH_CACHE_TTL seconds.
+# The cache is per process. Deleting a user drops them from the cache of the process that deleted
+# them, but under gunicorn the other workers keep accepting the deleted user's tokens until their
+# entry expires, for up to AUTH_CACHE_TTL seconds.
+AUTH_CACHE_MAXSIZE = int(os.getenv('AUTH_CACHE_MAXSIZE', 10000))
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 300))
+
+known_user_ids = TTLCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=AUTH_CACHE_TTL)
+# cachetools caches aren't thread safe
+cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def user_exists(user_id):
+    with cache_lock:
+        if user_id in known_user_ids:
+            cache_stats["hits"] += 1
+            record_cache_lookup("auth_user", "hit")
+            return True
+        cache_stats["misses"] += 1
+    record_cache_lookup("auth_user", "miss")
+
+    exists = db.session.query(User.id).filter_by(id=user_id).first() is not None
+    if exists:
+        with cache_lock:
+            known_user_ids[user_id] = True
+    return exists
+
+def invalidate_user(user_id):
+    with cache_lock:
+        if known_user_ids.pop(user_id, None):
+            cache_stats["invalidations"] += 1
+
+def clear_auth_cache():
+    with cache_lock:
+        known_user_ids.clear()
+
+def get_auth_cache_stats():
+    with cache_lock:
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        return {
+            **cache_stats,
+            "hit_rate": cache_stats["hits"] / lookups if lookups else None,
+            "size": len(known_user_ids),
+            "maxsize": known_user_ids.maxsize,
+            "ttl": known_user_ids.ttl,
+        }
+
+# Drop deleted users from this process's cache (covers session.delete(user), not bulk query
+# deletes, which should call invalidate_user themselves)
+@event.listens_for(User, "after_delete")
+def invalidate_deleted_user(mapper, connection, user):
+    invalidate_user(user.id)
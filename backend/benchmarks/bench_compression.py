@@ -0,0 +1,120 @@
+# Measures what compressing the large JSON responses (compression.py) saves and costs: for each
+# response, its size and the CPU time to compress it with gzip and brotli at a few levels.
+# The responses come from the endpoints of bench_endpoints.py on the same generated dataset, with
+# compression off so that the raw body is measured. Brotli levels are skipped if the brotli package
+# isn't installed.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_compression.py [--repeat 20] [--limit 100]
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from app import create_app
+from migrations import migrate_database
+from datagen import generate_data
+from compression import brotli
+from bench_endpoints import DATASET, find_fixtures, make_token
+
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 11]
+
+
+# [(name, compress(data))]
+def compressors():
+    result = []
+    for level in GZIP_LEVELS:
+        result.append((f"gzip-{level}", lambda data, level=level: gzip_compress(data, level)))
+    if brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            result.append((f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)))
+    return result
+
+def gzip_compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+def response_paths(fixtures, limit):
+    seller, buyer = fixtures["seller"], fixtures["buyer"]
+    return [
+        (seller, "GET /api/store-items", f"/api/store-items?limit={limit}"),
+        (seller, "GET /api/forum/posts", f"/api/forum/posts?limit={limit}"),
+        (seller, "GET /api/forum/posts/<id>", f"/api/forum/posts/{fixtures['hot_post']}?limit={limit}"),
+        (seller, "GET /api/user/<id>/store-items", f"/api/user/{seller}/store-items?limit={limit}"),
+        (seller, "GET /api/user/<id>/liked-items", f"/api/user/{seller}/liked-items?limit={limit}"),
+        (buyer, "GET /api/user/<id>/offers-made", f"/api/user/{buyer}/offers-made?limit={limit}"),
+        (seller, "GET /api/user/<id>/offers-received", f"/api/user/{seller}/offers-received?limit={limit}"),
+        (seller, "GET /api/search", f"/api/search?q=vintage&limit={limit}"),
+        (seller, "GET /api/metrics", "/api/metrics"),
+    ]
+
+# Median CPU time of compress(data) in ms, and the compressed size
+def measure(compress, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        compressed = compress(data)
+        timings.append(time.process_time() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, len(compressed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20, help="compressions of each response per level")
+    parser.add_argument("--limit", type=int, default=100, help="page size of the feeds")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the dataset volumes")
+    args = parser.parse_args()
+
+    dataset = {key: int(value * args.scale) for key, value in DATASET.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "BLOB_STORE_DIR": os.path.join(tmp, "blobs"),
+            "COMPRESSION": False,
+        })
+        print(f"Generating dataset {dataset}")
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            migrate_database()
+            generate_data(seed=1, **dataset)
+        fixtures = find_fixtures(app)
+
+        bodies = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for user, name, path in response_paths(fixtures, args.limit):
+                client = app.test_client()
+                client.set_cookie("access_token", make_token(app, user))
+                bodies.append((name, client.get(path).get_data()))
+
+    if brotli is None:
+        print("brotli isn't installed, only gzip is measured (pip install brotli)")
+    levels = compressors()
+    print(f"{'response':<38} {'bytes':>8}" + "".join(f" {name:>16}" for name, _ in levels))
+    print(f"{'':<38} {'':>8}" + "".join(f" {'bytes / ms':>16}" for _ in levels))
+    totals = {name: [0, 0.0] for name, _ in levels}
+    total_bytes = 0
+    for name, data in bodies:
+        total_bytes += len(data)
+        line = f"{name:<38} {len(data):>8}"
+        for level_name, compress in levels:
+            cpu_ms, size = measure(compress, data, args.repeat)
+            totals[level_name][0] += size
+            totals[level_name][1] += cpu_ms
+            line += f" {f'{size} / {cpu_ms:.2f}':>16}"
+        print(line)
+    line = f"{'total':<38} {total_bytes:>8}"
+    for level_name, _ in levels:
+        size, cpu_ms = totals[level_name]
+        line += f" {f'{size} / {cpu_ms:.2f}':>16}"
+    print(line)
+    print(f"{'ratio':<38} {'':>8}" + "".join(f" {f'{totals[name][0] / total_bytes:.1%}':>16}" for name, _ in levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# Benchmarks every /api/* endpoint against a generated dataset (see datagen.py) and checks the
+# results against per-endpoint budgets (endpoint_budgets.json): the number of SQL statements a
+# request runs, its response size and its p95 latency. A budget exceeded, or an unexpected status
+# code, fails the run with exit code 1, e.g. when an N+1 query comes back.
+# Requests go through the Flask test client, authenticated with a minted JWT cookie, so latencies
+# don't include the network or the server. Login is benchmarked with a Google ID token signed by
+# a local key, verified against that key instead of Google's certs.
+# The store feed and liked items are also requested at two page sizes, which must run the same
+# number of SQL statements, e.g. so that attach_like_data doesn't go back to a query per item.
+# Results are written as JSON, to compare two runs with --baseline.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_endpoints.py [--requests 30] [--output results.json] [--baseline previous.json]
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import jwt
+import rsa
+from google.auth import crypt as google_crypt, jwt as google_jwt
+from sqlalchemy import event, text
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from app import create_app
+from models import db
+from migrations import migrate_database
+from datagen import generate_data, MOCK_IMAGES_DIR
+from google_login import GoogleTokenVerifier, StaticCertSource
+
+DEFAULT_BUDGETS_FILE = os.path.join(BENCHMARKS_DIR, "endpoint_budgets.json")
+GOOGLE_CLIENT_ID = "bench-client-id"
+GOOGLE_KEY_ID = "bench-key"
+
+# A tenth of the `flask generate-data` defaults
+DATASET = {"users": 1000, "listings": 20000, "likes": 200000, "offers": 50000, "posts": 10000, "comments": 100000}
+
+# Page sizes at which the feeds must run the same number of statements. Both fit in one streamed
+# batch (STREAM_BATCH_SIZE): bigger pages run the batch queries once per batch
+PAGE_SIZES = (5, 40)
+
+
+def scalar(app, sql):
+    with app.app_context():
+        return db.session.execute(text(sql)).scalar()
+
+def make_token(app, user_id):
+    return jwt.encode({"user_id": user_id, "name": "bench", "email": "bench"}, app.config["SECRET_KEY"], algorithm="HS256")
+
+# Makes login verify Google ID tokens against a local key. Returns a function that mints a token
+def use_local_google_key(app):
+    public_key, private_key = rsa.newkeys(2048)
+    app.extensions["google_token_verifier"] = GoogleTokenVerifier(
+        GOOGLE_CLIENT_ID, StaticCertSource({GOOGLE_KEY_ID: public_key.save_pkcs1().decode()})
+    )
+    signer = google_crypt.RSASigner.from_string(private_key.save_pkcs1().decode(), key_id=GOOGLE_KEY_ID)
+
+    def mint(email, name):
+        now = int(time.time())
+        payload = {"iss": "https://accounts.google.com", "aud": GOOGLE_CLIENT_ID, "iat": now, "exp": now + 3600,
+                   "sub": email, "email": email, "name": name}
+        return google_jwt.encode(signer, payload).decode()
+    return mint
+
+def find_fixtures(app):
+    with app.app_context():
+        query = lambda sql: db.session.execute(text(sql)).scalar()
+        # the most active user sells the most listings; the buyer makes offers on them
+        seller = query("SELECT user_id FROM item_listing WHERE is_available GROUP BY user_id ORDER BY count(*) DESC LIMIT 1")
+        return {
+            "seller": seller,
+            "seller_email": query(f"SELECT email FROM user WHERE id = {seller}"),
+            "buyer": query(f"SELECT id FROM user WHERE id != {seller} ORDER BY id LIMIT 1"),
+            # has the most liked items
+            "liker": query("SELECT user_id FROM item_like GROUP BY user_id ORDER BY count(*) DESC LIMIT 1"),
+            "seller_item": query(f"SELECT id FROM item_listing WHERE user_id = {seller} AND is_available ORDER BY id LIMIT 1"),
+            "liked_item": query("SELECT id FROM item_listing ORDER BY like_count DESC LIMIT 1"),
+            "hot_post": query("SELECT id FROM forum_post ORDER BY comment_count DESC LIMIT 1"),
+            "photo_post": query("SELECT id FROM forum_post WHERE photo_hash IS NOT NULL LIMIT 1"),
+            # image URLs as the payloads give them, see item_image_url
+            "liked_item_image": query("SELECT '/api/images/item/' || id || '/' || picture_hash FROM item_listing ORDER BY like_count DESC LIMIT 1"),
+            "photo_post_image": query("SELECT '/api/images/post/' || id || '/' || photo_hash FROM forum_post WHERE photo_hash IS NOT NULL LIMIT 1"),
+        }
+
+# [(name, expected status, prepare)]. prepare() runs before each (untimed) request and returns
+# (user making the request, method, path, test client keyword arguments)
+def endpoint_cases(app, clients, fixtures, mint_google_token):
+    f = fixtures
+    seller, buyer = f["seller"], f["buyer"]
+    with open(os.path.join(MOCK_IMAGES_DIR, sorted(os.listdir(MOCK_IMAGES_DIR))[0]), "rb") as image_file:
+        image_data = image_file.read()
+
+    def new_item():
+        clients[seller].post("/api/store-items", data=item_form(), content_type="multipart/form-data")
+        return scalar(app, "SELECT max(id) FROM item_listing")
+
+    def item_form():
+        return {"user_id": str(seller), "title": "Bench Jacket", "description": "benchmark item", "price": "20",
+                "color": "Blue", "gender": "Men", "size": "M", "condition": "Good", "category": "Jackets",
+                "picture_file": (io.BytesIO(image_data), "bench.jpg")}
+
+    def new_offer(accept=False):
+        clients[buyer].post(f"/api/store-items/{f['seller_item']}/offer", json={"offer_amount": 10})
+        offer_id = scalar(app, "SELECT max(id) FROM item_offer")
+        if accept:
+            clients[seller].put(f"/api/offers/{offer_id}/accept")
+        return offer_id
+
+    def new_post():
+        clients[seller].post("/api/forum/posts", data={"title": "Bench", "content": "benchmark post", "category": "General"})
+        return scalar(app, "SELECT max(id) FROM forum_post")
+
+    def new_comment():
+        clients[seller].post(f"/api/forum/posts/{f['hot_post']}/comments", json={"content": "benchmark comment"})
+        return scalar(app, "SELECT max(id) FROM forum_comment")
+
+    # logging out clears the cookie of the client, so it gets its own
+    def logout():
+        clients["logout"].set_cookie("access_token", make_token(app, seller))
+        return "logout", "POST", "/api/logout", {}
+
+    get = lambda path: lambda: (seller, "GET", path, {})
+
+    # requests the path with the ETag of the current response, to get a 304
+    def revalidate(path):
+        def prepare():
+            etag = clients[seller].get(path).headers["ETag"]
+            return seller, "GET", path, {"headers": {"If-None-Match": etag}}
+        return prepare
+    return [
+        ("GET /api/hello", 200, get("/api/hello")),
+        ("GET /api/cache-stats", 200, get("/api/cache-stats")),
+        ("GET /api/metrics", 200, get("/api/metrics")),
+        ("GET /api/me", 200, get("/api/me")),
+        ("POST /api/login", 200, lambda: (None, "POST", "/api/login", {"json": {"google_token": mint_google_token(f["seller_email"], "bench")}})),
+        ("POST /api/logout", 200, logout),
+        ("GET /api/store-items", 200, get("/api/store-items")),
+        ("GET /api/store-items (filtered)", 200, get("/api/store-items?category=Tops&size=M&color=Blue")),
+        ("GET /api/store-items (not modified)", 304, revalidate("/api/store-items")),
+        ("GET /api/store-items/<id>", 200, get(f"/api/store-items/{f['liked_item']}")),
+        ("GET /api/store-items/<id> (not modified)", 304, revalidate(f"/api/store-items/{f['liked_item']}")),
+        ("POST /api/store-items", 201, lambda: (seller, "POST", "/api/store-items", {"data": item_form(), "content_type": "multipart/form-data"})),
+        ("DELETE /api/store-items/<id>", 200, lambda: (seller, "DELETE", f"/api/store-items/{new_item()}", {})),
+        ("POST /api/store-items/<id>/like", 200, lambda: (seller, "POST", f"/api/store-items/{f['liked_item']}/like", {})),
+        ("POST /api/store-items/<id>/offer", 200, lambda: (buyer, "POST", f"/api/store-items/{f['seller_item']}/offer", {"json": {"offer_amount": 10}})),
+        ("GET /api/user/<id>", 200, get(f"/api/user/{seller}")),
+        ("GET /api/user/<id>/store-items", 200, get(f"/api/user/{seller}/store-items")),
+        ("GET /api/user/<id>/liked-items", 200, get(f"/api/user/{seller}/liked-items")),
+        ("GET /api/user/<id>/forum-posts", 200, get(f"/api/user/{seller}/forum-posts")),
+        ("GET /api/user/<id>/stats", 200, get(f"/api/user/{seller}/stats")),
+        ("PUT /api/user/<id>/bio", 200, lambda: (seller, "PUT", f"/api/user/{seller}/bio", {"json": {"bio": "benchmark bio"}})),
+        ("GET /api/user/<id>/offers-made", 200, lambda: (buyer, "GET", f"/api/user/{buyer}/offers-made", {})),
+        ("GET /api/user/<id>/offers-received", 200, get(f"/api/user/{seller}/offers-received")),
+        ("PUT /api/offers/<id>/accept", 200, lambda: (seller, "PUT", f"/api/offers/{new_offer()}/accept", {})),
+        ("PUT /api/offers/<id>/decline", 200, lambda: (seller, "PUT", f"/api/offers/{new_offer()}/decline", {})),
+        ("PUT /api/offers/<id>/complete-buyer", 200, lambda: (buyer, "PUT", f"/api/offers/{new_offer(accept=True)}/complete-buyer", {})),
+        ("PUT /api/offers/<id>/complete-seller", 200, lambda: (seller, "PUT", f"/api/offers/{new_offer(accept=True)}/complete-seller", {})),
+        ("DELETE /api/offers/<id>/delete-pending", 200, lambda: (buyer, "DELETE", f"/api/offers/{new_offer()}/delete-pending", {})),
+        ("PUT /api/offers/<id>/cancel-accepted", 200, lambda: (buyer, "PUT", f"/api/offers/{new_offer(accept=True)}/cancel-accepted", {})),
+        ("GET /api/search", 200, get("/api/search?q=vintage")),
+        ("GET /api/images/item/<id>", 200, get(f"{f['liked_item_image']}?size=card")),
+        ("GET /api/images/post/<id>", 200, get(f"{f['photo_post_image']}?size=card")),
+        ("GET /api/forum/posts", 200, get("/api/forum/posts")),
+        ("GET /api/forum/posts (not modified)", 304, revalidate("/api/forum/posts")),
+        ("GET /api/forum/posts/<id>", 200, get(f"/api/forum/posts/{f['hot_post']}")),
+        ("GET /api/forum/posts/<id> (not modified)", 304, revalidate(f"/api/forum/posts/{f['hot_post']}")),
+        ("GET /api/forum/posts/<id>/comments", 200, get(f"/api/forum/posts/{f['hot_post']}/comments")),
+        ("POST /api/forum/posts", 201, lambda: (seller, "POST", "/api/forum/posts", {"data": {"title": "Bench", "content": "benchmark post", "category": "General"}})),
+        ("POST /api/forum/posts/<id>/comments", 201, lambda: (seller, "POST", f"/api/forum/posts/{f['hot_post']}/comments", {"json": {"content": "benchmark comment"}})),
+        ("DELETE /api/forum/posts/<id>", 200, lambda: (seller, "DELETE", f"/api/forum/posts/{new_post()}", {})),
+        ("DELETE /api/forum/comments/<id>", 200, lambda: (seller, "DELETE", f"/api/forum/comments/{new_comment()}", {})),
+    ]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_case(clients, statements, case, requests, warmup):
+    name, expected_status, prepare = case
+    latencies = []
+    statement_counts = []
+    statuses = set()
+    response_bytes = 0
+    for index in range(warmup + requests):
+        user, method, path, kwargs = prepare()
+        statements["count"] = 0
+        start = time.perf_counter()
+        response = clients[user].open(path, method=method, **kwargs)
+        response_body = response.get_data()
+        elapsed = time.perf_counter() - start
+        if index < warmup:
+            continue
+        latencies.append(elapsed)
+        statement_counts.append(statements["count"])
+        statuses.add(response.status_code)
+        response_bytes = max(response_bytes, len(response_body))
+    latencies.sort()
+    return {
+        "status": sorted(statuses),
+        "expected_status": expected_status,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "statements": max(statement_counts),
+        "bytes": response_bytes,
+    }
+
+# Requests each feed at every page size of PAGE_SIZES.
+# Returns {name: ([statements per page size], [problems])}
+def count_page_statements(clients, statements, fixtures):
+    feeds = [
+        ("GET /api/store-items", "/api/store-items?limit={}"),
+        ("GET /api/user/<id>/liked-items", f"/api/user/{fixtures['liker']}/liked-items?limit={{}}"),
+    ]
+    results = {}
+    for name, path in feeds:
+        counts = []
+        problems = []
+        for limit in PAGE_SIZES:
+            response = clients[fixtures["seller"]].get(path.format(limit))
+            # a short page says nothing about how the count grows: the dataset is too small
+            if len(response.get_json()["items"]) < limit:
+                problems.append(f"fewer than {limit} items, dataset too small")
+            statements["count"] = 0
+            clients[fixtures["seller"]].get(path.format(limit)).get_data()
+            counts.append(statements["count"])
+        if len(set(counts)) > 1:
+            problems.append("grows with the page size")
+        results[name] = (counts, problems)
+    return results
+
+# Returns the budget violations of one endpoint's result
+def check_budget(result, budget):
+    problems = []
+    if result["status"] != [result["expected_status"]]:
+        problems.append(f"status {result['status']}, expected {result['expected_status']}")
+    for key, limit_key in [("statements", "max_statements"), ("bytes", "max_bytes"), ("p95_ms", "max_p95_ms")]:
+        if limit_key in budget and result[key] > budget[limit_key]:
+            problems.append(f"{key} {result[key]} > {budget[limit_key]}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=30, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS_FILE)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the dataset volumes")
+    args = parser.parse_args()
+
+    dataset = {key: int(value * args.scale) for key, value in DATASET.items()}
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["endpoints"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "BLOB_STORE_DIR": os.path.join(tmp, "blobs"),
+        })
+        print(f"Generating dataset {dataset}")
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            migrate_database()
+            generate_data(seed=1, **dataset)
+        mint_google_token = use_local_google_key(app)
+        fixtures = find_fixtures(app)
+
+        clients = {None: app.test_client(), "logout": app.test_client()}
+        for user_id in (fixtures["seller"], fixtures["buyer"]):
+            clients[user_id] = app.test_client()
+            clients[user_id].set_cookie("access_token", make_token(app, user_id))
+
+        # counts the SQL statements of each request
+        statements = {"count": 0}
+        with app.app_context():
+            @event.listens_for(db.engine, "before_cursor_execute")
+            def count_statement(*args):
+                statements["count"] += 1
+
+        results = {}
+        # the routes print their errors and progress, keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            for case in endpoint_cases(app, clients, fixtures, mint_google_token):
+                results[case[0]] = run_case(clients, statements, case, args.requests, args.warmup)
+            page_statements = count_page_statements(clients, statements, fixtures)
+
+    print(f"{'endpoint':<42} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'stmts':>6} {'bytes':>8}  budget")
+    failures = 0
+    for name, result in results.items():
+        problems = check_budget(result, budgets.get(name, {}))
+        if name not in budgets:
+            problems.append("no budget")
+        failures += bool(problems)
+        line = (f"{name:<42} {','.join(map(str, result['status'])):>6} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                f"{result['statements']:>6} {result['bytes']:>8}  {'; '.join(problems) or 'ok'}")
+        if baseline and name in baseline:
+            before = baseline[name]
+            line += (f"  (was p95 {before['p95_ms']:.2f} ms, {before['statements']} stmts, {before['bytes']} bytes)")
+        print(line)
+
+    print(f"{'statements per page of':<42} " + " ".join(f"{size:>6}" for size in PAGE_SIZES))
+    for name, (counts, problems) in page_statements.items():
+        failures += bool(problems)
+        print(f"{name:<42} " + " ".join(f"{count:>6}" for count in counts) + f"  {'; '.join(problems) or 'ok'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "dataset": dataset,
+                "requests": args.requests,
+                "endpoints": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if failures:
+        print(f"{failures} endpoint(s) over budget or failing the page size check")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Compares the JSON providers (json_provider.py) with Flask's default one on the responses of the
+# big list endpoints: the time to turn the route's result into a response, and the peak memory it
+# allocates doing so (tracemalloc), which includes the response body.
+# The routes run once against the generated dataset of bench_endpoints.py; what they pass to
+# jsonify (or the whole page, for streamed ones) is kept and serialized again by each provider.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_json.py [--repeat 50] [--limit 100]
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from flask.json.provider import DefaultJSONProvider
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from app import create_app
+from migrations import migrate_database
+from datagen import generate_data
+from json_provider import StdlibJSONProvider, OrjsonJSONProvider, orjson
+from bench_endpoints import DATASET, find_fixtures, make_token
+from bench_compression import response_paths
+
+
+# Keeps what each response was made from. Streamed pages (streaming.py) are serialized a batch of
+# items at a time, then the keys after the items: they are put back together as one page
+class RecordingJSONProvider(StdlibJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        self.objects = []
+        self.pieces = []
+
+    def response(self, *args, **kwargs):
+        self.objects.append(self._prepare_response_obj(args, kwargs))
+        return super().response(*args, **kwargs)
+
+    def dumps_bytes(self, obj):
+        self.pieces.append(obj)
+        return super().dumps_bytes(obj)
+
+    def start(self):
+        self.objects.clear()
+        self.pieces.clear()
+
+    def recorded_object(self):
+        if self.objects:
+            return self.objects[-1]
+        *batches, rest = self.pieces
+        return {"items": [item for batch in batches for item in batch], **rest}
+
+def providers(app):
+    result = [("flask default", DefaultJSONProvider(app)), ("json", StdlibJSONProvider(app))]
+    if orjson is not None:
+        result.append(("orjson", OrjsonJSONProvider(app)))
+    return result
+
+# Median time in ms and peak memory in bytes of provider.response(obj)
+def measure(provider, obj, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        provider.response(obj)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    tracemalloc.start()
+    provider.response(obj)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings[len(timings) // 2] * 1000, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50, help="serializations of each response per provider")
+    parser.add_argument("--limit", type=int, default=100, help="page size of the feeds")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the dataset volumes")
+    args = parser.parse_args()
+
+    dataset = {key: int(value * args.scale) for key, value in DATASET.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "BLOB_STORE_DIR": os.path.join(tmp, "blobs"),
+            "COMPRESSION": False,
+        })
+        print(f"Generating dataset {dataset}")
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            migrate_database()
+            generate_data(seed=1, **dataset)
+        fixtures = find_fixtures(app)
+
+        recorder = app.json = RecordingJSONProvider(app)
+        objects = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for user, name, path in response_paths(fixtures, args.limit):
+                # /api/metrics isn't JSON
+                if path == "/api/metrics":
+                    continue
+                client = app.test_client()
+                client.set_cookie("access_token", make_token(app, user))
+                recorder.start()
+                client.get(path).get_data()
+                objects.append((name, recorder.recorded_object()))
+
+        levels = providers(app)
+        print(f"{'response':<38}" + "".join(f" {name:>20}" for name, _ in levels))
+        print(f"{'':<38}" + "".join(f" {'ms / peak KB':>20}" for _ in levels))
+        totals = {name: [0.0, 0] for name, _ in levels}
+        with app.app_context():
+            for name, obj in objects:
+                line = f"{name:<38}"
+                for provider_name, provider in levels:
+                    elapsed_ms, peak = measure(provider, obj, args.repeat)
+                    totals[provider_name][0] += elapsed_ms
+                    totals[provider_name][1] = max(totals[provider_name][1], peak)
+                    line += f" {f'{elapsed_ms:.2f} / {peak / 1024:.0f}':>20}"
+                print(line)
+        print(f"{'total ms / max peak KB':<38}" + "".join(
+            f" {f'{totals[name][0]:.2f} / {totals[name][1] / 1024:.0f}':>20}" for name, _ in levels
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Compares the throughput of the Flask development server (single threaded, as `python app.py`
+# ran it before) with gunicorn (gunicorn.conf.py), on a copy of the seeded mock database.
+# Client threads keep requesting the forum feed, the store feed and a store item over keep-alive
+# connections for a fixed time.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_server.py [--clients 16] [--seconds 10] [--workers 4] [--threads 4]
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import jwt
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+from app import create_app, init_database
+
+PATHS = ["/api/forum/posts", "/api/store-items", "/api/store-items/1"]
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+def run_load(base_url, token, clients, seconds):
+    stats = {"requests": 0, "errors": 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        session = requests.Session()
+        session.cookies.set("access_token", token)
+        local_latencies = []
+        errors = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if session.get(base_url + random.choice(PATHS), timeout=10).status_code != 200:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            stats["requests"] += len(local_latencies)
+            stats["errors"] += errors
+            latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    stats["requests_per_second"] = stats["requests"] / seconds
+    stats["p50_ms"] = latencies[len(latencies) // 2] * 1000
+    stats["p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            BLOB_STORE_DIR=os.path.join(tmp, "blobs"),
+            JWT_SECRET_KEY="bench-secret",
+            GUNICORN_WORKERS=str(args.workers),
+            GUNICORN_THREADS=str(args.threads),
+            GUNICORN_BIND=f"127.0.0.1:{args.port}",
+            GUNICORN_ACCESS_LOG="",
+        )
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": env["DATABASE_URL"],
+            "BLOB_STORE_DIR": env["BLOB_STORE_DIR"],
+        })
+        init_database(app, seed=True)
+        token = jwt.encode({"user_id": 1, "name": "bench", "email": "bench"}, "bench-secret", algorithm="HS256")
+
+        servers = {
+            "flask dev server": [
+                sys.executable, "-c",
+                f"from app import create_app; create_app().run(port={args.port}, threaded=False)",
+            ],
+            f"gunicorn {args.workers}x{args.threads}": [
+                sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app",
+            ],
+        }
+
+        print(f"{args.clients} clients, {args.seconds}s per server")
+        print(f"{'server':<20} {'req/s':>8} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, command in servers.items():
+            process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                wait_until_up(base_url + "/api/hello", process)
+                stats = run_load(base_url, token, args.clients, args.seconds)
+            finally:
+                process.terminate()
+                process.wait()
+            print(
+                f"{name:<20} {stats['requests_per_second']:>8.0f} {stats['requests']:>9} "
+                f"{stats['errors']:>7} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# Compares SQLite throughput with the default settings and with the PRAGMAs from db_engine.py,
+# under a mixed load: threads that mostly read store feed pages and sometimes like an item
+# (insert a like + update the counter, in one transaction), against a freshly generated database.
+# Then measures what the statement stats of request_timing.py (installed when METRICS or
+# REQUEST_TIMING is on) add to each statement: a store feed page and a lookup by primary key run
+# on one connection, in rounds with and without the event listeners, inside a request context.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_sqlite_engine.py [--threads 8] [--seconds 10] [--write-ratio 0.2]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from flask import Flask
+from sqlalchemy import create_engine, event, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from models import db
+from db_engine import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+from request_timing import before_cursor_execute, after_cursor_execute, handle_error, start_request_stats
+import facets, search  # noqa: F401 (registers the triggers and search tables)
+
+FEED_QUERY = text("""
+    SELECT id, title, price, like_count FROM item_listing
+    WHERE is_available = 1 ORDER BY created_at DESC, id DESC LIMIT 24
+""")
+INSERT_LIKE = text("INSERT INTO item_like (item_id, user_id, created_at) VALUES (:item_id, :user_id, CURRENT_TIMESTAMP)")
+UPDATE_LIKE_COUNT = text("UPDATE item_listing SET like_count = like_count + 1 WHERE id = :item_id")
+ITEM_QUERY = text("SELECT id, title, price, like_count FROM item_listing WHERE id = :item_id")
+STATS_LISTENERS = [
+    ("before_cursor_execute", before_cursor_execute),
+    ("after_cursor_execute", after_cursor_execute),
+    ("handle_error", handle_error),
+]
+
+
+def make_engine(path, pragmas, threads):
+    engine = create_engine(f"sqlite:///{path}", pool_size=threads, max_overflow=0)
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
+    return engine
+
+def seed(engine, users, items):
+    db.metadata.create_all(engine)
+    now = time.time()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO blob (hash, size, content_type, refcount) VALUES ('0', 0, 'image/jpeg', 1)"))
+        conn.execute(
+            text("INSERT INTO user (id, name, email) VALUES (:id, :name, :email)"),
+            [{"id": i, "name": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, users + 1)],
+        )
+        conn.execute(
+            text("""
+                INSERT INTO item_listing (title, user_id, description, price, category, size, color,
+                                          gender, condition, picture_hash, is_available, created_at, like_count)
+                VALUES (:title, :user_id, 'benchmark item', :price, 'Tops', 'M', 'Blue', 'Unisex', 'Good',
+                        '0', 1, datetime(:created_at, 'unixepoch'), 0)
+            """),
+            [
+                {"title": f"item {i}", "user_id": random.randint(1, users), "price": random.uniform(1, 100), "created_at": now - i}
+                for i in range(items)
+            ],
+        )
+
+def run_load(engine, threads, seconds, write_ratio, users, items):
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        rng = random.Random()
+        local = {"reads": 0, "writes": 0, "errors": 0}
+        local_latencies = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    item_id = rng.randint(1, items)
+                    with engine.begin() as conn:
+                        conn.execute(INSERT_LIKE, {"item_id": item_id, "user_id": rng.randint(1, users)})
+                        conn.execute(UPDATE_LIKE_COUNT, {"item_id": item_id})
+                    local["writes"] += 1
+                else:
+                    with engine.connect() as conn:
+                        conn.execute(FEED_QUERY).all()
+                    local["reads"] += 1
+            except Exception:
+                # e.g. "database is locked"
+                local["errors"] += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            for key in stats:
+                stats[key] += local[key]
+            latencies.extend(local_latencies)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    latencies.sort()
+    stats["ops_per_second"] = (stats["reads"] + stats["writes"]) / seconds
+    stats["p50_ms"] = latencies[len(latencies) // 2] * 1000 if latencies else None
+    stats["p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None
+    return stats
+
+# Installs or removes the listeners of request_timing.track_request_statements on engine
+def set_statement_stats(engine, enabled):
+    for identifier, listener in STATS_LISTENERS:
+        if enabled and not event.contains(engine, identifier, listener):
+            event.listen(engine, identifier, listener)
+        elif not enabled and event.contains(engine, identifier, listener):
+            event.remove(engine, identifier, listener)
+
+# Returns {statement name: (µs per statement without, with the statement stats)}, the best of
+# rounds of repeat statements each, alternating without and with the listeners
+def statement_stats_cost(engine, items, rounds=20, repeat=1000):
+    statements = [("store feed page", FEED_QUERY, {}), ("item by id", ITEM_QUERY, {"item_id": items // 2})]
+    best = {(name, tracked): float("inf") for name, _, _ in statements for tracked in (False, True)}
+    # the statement stats only record inside a request
+    with Flask(__name__).test_request_context(), engine.connect() as conn:
+        start_request_stats()
+        for _ in range(rounds):
+            for tracked in (False, True):
+                set_statement_stats(engine, tracked)
+                for name, statement, params in statements:
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        conn.execute(statement, params).all()
+                    best[(name, tracked)] = min(best[(name, tracked)], (time.perf_counter() - start) / repeat)
+        set_statement_stats(engine, False)
+    return {name: (best[(name, False)] * 1e6, best[(name, True)] * 1e6) for name, _, _ in statements}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--items", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.seconds}s, {args.write_ratio:.0%} writes, {args.items} items")
+    print(f"{'profile':<10} {'ops/s':>9} {'reads':>8} {'writes':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, pragmas in [("default", {}), ("tuned", DEFAULT_SQLITE_PRAGMAS)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(os.path.join(tmp, "bench.db"), pragmas, args.threads)
+            seed(engine, args.users, args.items)
+            stats = run_load(engine, args.threads, args.seconds, args.write_ratio, args.users, args.items)
+            engine.dispose()
+        print(
+            f"{name:<10} {stats['ops_per_second']:>9.0f} {stats['reads']:>8} {stats['writes']:>8} "
+            f"{stats['errors']:>7} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}"
+        )
+
+    print("Statement stats (METRICS or REQUEST_TIMING), tuned profile, 1 thread")
+    print(f"{'statement':<16} {'without us':>11} {'with us':>9} {'added us':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), DEFAULT_SQLITE_PRAGMAS, 1)
+        seed(engine, args.users, args.items)
+        for name, (without, with_stats) in statement_stats_cost(engine, args.items).items():
+            print(f"{name:<16} {without:>11.1f} {with_stats:>9.1f} {with_stats - without:>9.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Compares the peak memory and time of the streamed store feed (streaming.py) with building the
+# whole page first, as the route did before (paginate, serialize, attach_like_data, jsonify), for
+# growing page sizes. Pages are requested after a cursor, so without the facet counts of the first
+# page. Peak memory is measured with tracemalloc over the whole request, reading the response body
+# chunk by chunk as a server sends it.
+#
+# Run from the backend directory:
+#   python benchmarks/bench_streaming.py [--requests 10] [--limits 24,100,500,1000]
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from flask import jsonify, make_response, request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from app import create_app
+from models import ItemListing
+from migrations import migrate_database
+from datagen import generate_data
+from pagination import get_page_args, paginate
+from streaming import MAX_STREAM_PAGE_LIMIT
+from facets import parse_store_filters, apply_store_filters, get_facet_counts
+from conditional import make_etag, store_feed_version, with_etag
+from enrichment import attach_like_data
+from bench_endpoints import DATASET, make_token, find_fixtures
+
+# user of the buffered route
+BUFFERED_USER = {}
+
+
+# The store feed route as it was before streaming.py: the whole page is built in memory
+def buffered_store_items():
+    auth_user_id = BUFFERED_USER["id"]
+    limit, cursor = get_page_args(max_limit=MAX_STREAM_PAGE_LIMIT)
+    filters = parse_store_filters(request.args)
+    etag = make_etag(store_feed_version(filters, limit, cursor, auth_user_id))
+    query = apply_store_filters(ItemListing.query.filter_by(is_available=True), filters)
+    items, next_cursor = paginate(query, ItemListing.created_at, ItemListing.id, limit, cursor)
+    items_list = attach_like_data([item.serialize() for item in items], auth_user_id)
+    response = {"items": items_list, "next_cursor": next_cursor}
+    if not cursor:
+        response["facets"] = get_facet_counts(filters)
+    return with_etag(make_response(jsonify(response), 200), etag, private=True)
+
+# Returns (median ms, peak bytes, body bytes) of requesting path. Timed without tracemalloc, which
+# slows down every allocation
+def measure(client, path, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        read_body(client, path)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    tracemalloc.start()
+    size = read_body(client, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings[len(timings) // 2] * 1000, peak, size
+
+# Reads the body of path a chunk at a time, returns its size
+def read_body(client, path):
+    response = client.get(path, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10, help="requests per page size")
+    parser.add_argument("--limits", default="24,100,500,1000", help="page sizes, comma separated")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies the dataset volumes")
+    args = parser.parse_args()
+
+    dataset = {key: int(value * args.scale) for key, value in DATASET.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            "BLOB_STORE_DIR": os.path.join(tmp, "blobs"),
+            "COMPRESSION": False,
+        })
+        app.add_url_rule("/bench/buffered-store-items", view_func=buffered_store_items)
+        print(f"Generating dataset {dataset}")
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            migrate_database()
+            generate_data(seed=1, **dataset)
+        user = find_fixtures(app)["seller"]
+        BUFFERED_USER["id"] = user
+        client = app.test_client()
+        client.set_cookie("access_token", make_token(app, user))
+
+        # pages start after the first item, so that they don't have the facet counts
+        cursor = client.get("/api/store-items?limit=1").get_json()["next_cursor"]
+
+        print(f"{'rows':>6} {'bytes':>9} {'buffered ms':>12} {'peak KB':>9} {'streamed ms':>12} {'peak KB':>9}")
+        for limit in [int(limit) for limit in args.limits.split(",")]:
+            query_string = f"limit={limit}&cursor={cursor}"
+            # warm up
+            client.get(f"/api/store-items?{query_string}").close()
+            buffered_ms, buffered_peak, size = measure(client, f"/bench/buffered-store-items?{query_string}", args.requests)
+            streamed_ms, streamed_peak, _ = measure(client, f"/api/store-items?{query_string}", args.requests)
+            print(f"{limit:>6} {size:>9} {buffered_ms:>12.1f} {buffered_peak / 1024:>9.0f} {streamed_ms:>12.1f} {streamed_peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Races offer transitions (offer_state.py) from many threads and checks that no update is lost.
+# Each round creates an offer, then starts every thread at the same moment on it, each in its own
+# session and SQLite connection to a file database, as concurrent requests would be:
+# - on a pending offer: accept and decline (seller) and withdraw (buyer). Exactly one transition
+#   wins, and the offer ends in that transition's state. Every other attempt gets an OfferError.
+#   It runs again with every thread sending the version it read first (1), as clients do
+# - on an accepted offer: complete (buyer), complete (seller) and cancel (either). Each side
+#   completes at most once and cancel wins at most once, nothing can follow a cancel, and the
+#   offer is Completed if and only if both sides won without a cancel
+# In both, version goes up exactly once per winning transition.
+# Any violation fails the run with exit code 1.
+#
+# Run from the backend directory:
+#   python benchmarks/check_offer_races.py [--rounds 50] [--threads 8]
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+from app import create_app
+from models import db, ItemListing, ItemOffer
+from migrations import migrate_database
+from datagen import generate_data
+import offer_state
+from offer_state import OfferError
+
+
+def new_offer(app, item_id, status):
+    with app.app_context():
+        item = db.session.get(ItemListing, item_id)
+        buyer_id = 1 if item.user_id != 1 else 2
+        offer = ItemOffer(item_id=item_id, buyer_id=buyer_id, seller_id=item.user_id, offer_amount=10, status="Pending")
+        db.session.add(offer)
+        db.session.commit()
+        if status == "Accepted":
+            offer_state.accept_offer(offer.id, item.user_id)
+            db.session.commit()
+        return offer.id, buyer_id, item.user_id
+
+def read_offer(app, offer_id):
+    with app.app_context():
+        return db.session.execute(
+            db.select(ItemOffer.status, ItemOffer.version, ItemOffer.buyer_completed, ItemOffer.seller_completed)
+            .where(ItemOffer.id == offer_id)
+        ).first()
+
+# Runs every attempt (name, function) in its own thread, all starting together.
+# Returns the names of the attempts that won, in the order they committed
+def race(app, attempts):
+    barrier = threading.Barrier(len(attempts))
+    winners = []
+    errors = []
+    lock = threading.Lock()
+
+    def run(name, attempt):
+        with app.app_context():
+            barrier.wait()
+            try:
+                attempt()
+                db.session.commit()
+                with lock:
+                    winners.append(name)
+            except OfferError:
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                errors.append(f"{name}: {e!r}")
+
+    threads = [threading.Thread(target=run, args=attempt) for attempt in attempts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return winners, errors
+
+def race_pending(app, item_id, threads, use_version):
+    offer_id, buyer_id, seller_id = new_offer(app, item_id, "Pending")
+    version = 1 if use_version else None
+    kinds = [
+        ("accept", lambda: offer_state.accept_offer(offer_id, seller_id, version)),
+        ("decline", lambda: offer_state.decline_offer(offer_id, seller_id, version)),
+        ("withdraw", lambda: offer_state.withdraw_offer(offer_id, buyer_id, version)),
+    ]
+    winners, problems = race(app, [kinds[i % len(kinds)] for i in range(threads)])
+    offer = read_offer(app, offer_id)
+
+    if len(winners) != 1:
+        problems.append(f"{len(winners)} winners: {winners}")
+    elif winners[0] == "withdraw":
+        if offer is not None:
+            problems.append(f"withdrawn offer still exists: {offer}")
+    else:
+        expected_status = {"accept": "Accepted", "decline": "Declined"}[winners[0]]
+        if offer is None or offer.status != expected_status or offer.version != 1 + len(winners):
+            problems.append(f"{winners[0]} won but the offer is {offer}")
+    return winners, problems
+
+def race_accepted(app, item_id, threads):
+    offer_id, buyer_id, seller_id = new_offer(app, item_id, "Accepted")
+    kinds = [
+        ("complete-buyer", lambda: offer_state.complete_offer(offer_id, buyer_id, "buyer")),
+        ("complete-seller", lambda: offer_state.complete_offer(offer_id, seller_id, "seller")),
+        ("cancel", lambda: offer_state.cancel_offer(offer_id, buyer_id)),
+    ]
+    winners, problems = race(app, [kinds[i % len(kinds)] for i in range(threads)])
+    offer = read_offer(app, offer_id)
+    wins = Counter(winners)
+
+    for kind, count in wins.items():
+        if count > 1:
+            problems.append(f"{kind} won {count} times")
+    if "cancel" in wins and winners[-1] != "cancel":
+        problems.append(f"a transition won after cancel: {winners}")
+    if "cancel" in wins:
+        expected_status = "Cancelled"
+    elif wins["complete-buyer"] and wins["complete-seller"]:
+        expected_status = "Completed"
+    else:
+        expected_status = "Accepted"
+        problems.append(f"no cancel, but not both sides completed: {winners}")
+    # the accept made before the race is version 2
+    if offer.status != expected_status or offer.version != 2 + len(winners):
+        problems.append(f"{winners} won but the offer is {offer}")
+    with app.app_context():
+        available = db.session.get(ItemListing, item_id).is_available
+    if available == (expected_status == "Completed"):
+        problems.append(f"offer is {offer.status} but the item's is_available is {available}")
+    return winners, problems
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50, help="offers raced on, per scenario")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'races.db')}",
+            "BLOB_STORE_DIR": os.path.join(tmp, "blobs"),
+            "METRICS": False,
+        })
+        with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+            migrate_database()
+            generate_data(seed=1, users=10, listings=3 * args.rounds, likes=0, offers=0, posts=1, comments=0)
+            item_ids = [item_id for (item_id,) in db.session.query(ItemListing.id).order_by(ItemListing.id)]
+
+        failures = 0
+        outcomes = Counter()
+        for round_index in range(args.rounds):
+            scenarios = [
+                ("pending", lambda: race_pending(app, item_ids[3 * round_index], args.threads, use_version=False)),
+                ("pending with version", lambda: race_pending(app, item_ids[3 * round_index + 1], args.threads, use_version=True)),
+                ("accepted", lambda: race_accepted(app, item_ids[3 * round_index + 2], args.threads)),
+            ]
+            for name, scenario in scenarios:
+                winners, problems = scenario()
+                outcomes[(name, ", ".join(winners))] += 1
+                if problems:
+                    failures += 1
+                    print(f"round {round_index} {name}: {'; '.join(problems)}")
+
+    print(f"{args.rounds} rounds of {args.threads} threads per scenario")
+    for (name, winners), count in sorted(outcomes.items()):
+        print(f"  {name:<22} won by {winners or 'nobody':<40} {count:>4}")
+    if failures:
+        print(f"{failures} round(s) lost or duplicated an update")
+        sys.exit(1)
+    print("no lost or duplicated updates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import tempfile
+from itertools import islice
+from flask import current_app
+from sqlalchemy import delete, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Blob
+from images import guess_image_mimetype
+
+# Content-addressed storage for images.
+# Each blob is stored once on disk under its SHA-256, e.g. <BLOB_STORE_DIR>/ab/cd/abcd1234...
+# and the blob table keeps its size, content type and how many rows reference it.
+# Uploading the same bytes twice only bumps the refcount.
+# A blob's row and its file change under SQLite's write lock, so that a committed row always has
+# its file: put_blob writes the file after its row (whose write takes the lock until the caller
+# commits), and the garbage collection removes files before committing the deletion of their rows.
+# Files of uploads that were rolled back have no row; remove_orphan_blob_files sweeps them.
+
+BLOB_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def blob_path(blob_hash):
+    root = current_app.config['BLOB_STORE_DIR']
+    return os.path.join(root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+# Stores data (if not already stored) and adds one reference to it. Returns the blob hash.
+# The refcount change is part of the current session, so it's rolled back with it.
+def put_blob(data):
+    blob_hash = hashlib.sha256(data).hexdigest()
+
+    # insert the blob row, or bump its refcount if it already exists
+    statement = sqlite_insert(Blob).values(
+        hash=blob_hash,
+        size=len(data),
+        content_type=guess_image_mimetype(data),
+        refcount=1,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Blob.hash],
+        set_={"refcount": Blob.refcount + 1},
+    )
+    db.session.execute(statement)
+
+    # checked only now that the row is written: the garbage collection can't be between deleting
+    # the row and removing the file, so a file that exists stays
+    path = blob_path(blob_hash)
+    if not os.path.exists(path):
+        # write to a temp file first so that readers never see a partially written blob
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return blob_hash
+
+def read_blob(blob_hash):
+    with open(blob_path(blob_hash), "rb") as f:
+        return f.read()
+
+# Drops one reference to each blob (caller commits), see remove_unreferenced_blobs
+def release_blobs(blob_hashes):
+    blob_hashes = [blob_hash for blob_hash in blob_hashes if blob_hash]
+    if not blob_hashes:
+        return
+    for blob_hash in blob_hashes:
+        db.session.query(Blob)\
+            .filter_by(hash=blob_hash)\
+            .update({Blob.refcount: Blob.refcount - 1}, synchronize_session=False)
+
+# Deletes blobs that are no longer referenced, from the table and from disk.
+# Call after the commit that released them, so a rolled back delete never loses a file.
+def remove_unreferenced_blobs(blob_hashes):
+    blob_hashes = [blob_hash for blob_hash in blob_hashes if blob_hash]
+    if not blob_hashes:
+        return
+    delete_unreferenced_blobs(Blob.hash.in_(blob_hashes))
+
+# Deletes every blob with no references left, e.g. when a remove_unreferenced_blobs call failed.
+# Returns the number of blobs deleted
+def remove_all_unreferenced_blobs():
+    return len(delete_unreferenced_blobs())
+
+def delete_unreferenced_blobs(*conditions):
+    # the delete is the first statement of the transaction: it takes the write lock (and doesn't
+    # read an older snapshot first), which is held until the files are gone
+    unreferenced = db.session.execute(
+        delete(Blob)
+        .where(Blob.refcount <= 0, *conditions)
+        .returning(Blob.hash)
+    ).scalars().all()
+    for blob_hash in unreferenced:
+        try:
+            os.remove(blob_path(blob_hash))
+        except FileNotFoundError:
+            pass
+    db.session.commit()
+    return unreferenced
+
+def stored_blob_hashes():
+    root = current_app.config['BLOB_STORE_DIR']
+    for _, _, file_names in os.walk(root):
+        for file_name in file_names:
+            # skips the temp files of put_blob
+            if BLOB_HASH_PATTERN.fullmatch(file_name):
+                yield file_name
+
+# Removes the files that have no blob row, e.g. of an upload that was rolled back.
+# Each batch is checked with the write lock held, so that no put_blob is between writing its
+# file and committing its row. Call outside of a transaction. Returns the number of files removed
+def remove_orphan_blob_files(batch_size=500):
+    removed = 0
+    blob_hashes = stored_blob_hashes()
+    while batch := list(islice(blob_hashes, batch_size)):
+        db.session.execute(text("BEGIN IMMEDIATE"))
+        known = {
+            blob_hash for (blob_hash,) in db.session.query(Blob.hash).filter(Blob.hash.in_(batch))
+        }
+        for blob_hash in batch:
+            if blob_hash not in known:
+                try:
+                    os.remove(blob_path(blob_hash))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        db.session.commit()
+    return removed
+
+
+# (table, old image column, new blob hash column) for databases created before the blob store
+LEGACY_IMAGE_COLUMNS = [
+    ("item_listing", "picture_data", "picture_hash"),
+    ("forum_post", "photo_data", "photo_hash"),
+    ("image_variant", "data", "blob_hash"),
+]
+
+# Moves images stored in the database into the blob store, then drops the old columns
+def migrate_images_to_blob_store(batch_size=100):
+    Blob.__table__.create(db.engine, checkfirst=True)
+    inspector = inspect(db.engine)
+    migrated_any = False
+
+    for table, old_column, new_column in LEGACY_IMAGE_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if old_column not in columns:
+            continue
+        if new_column not in columns:
+            db.session.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN {new_column} VARCHAR(64) REFERENCES blob (hash)"
+            ))
+
+        moved = 0
+        while True:
+            rows = db.session.execute(text(
+                f"SELECT id, {old_column} FROM {table} "
+                f"WHERE {old_column} IS NOT NULL AND {new_column} IS NULL LIMIT :batch_size"
+            ), {"batch_size": batch_size}).all()
+            if not rows:
+                break
+            for row_id, data in rows:
+                db.session.execute(
+                    text(f"UPDATE {table} SET {new_column} = :blob_hash WHERE id = :id"),
+                    {"blob_hash": put_blob(data), "id": row_id},
+                )
+            db.session.commit()
+            moved += len(rows)
+
+        db.session.execute(text(f"ALTER TABLE {table} DROP COLUMN {old_column}"))
+        db.session.commit()
+        migrated_any = True
+        print(f"Moved {moved} images from {table}.{old_column} to the blob store.")
+
+    # give the space used by the old columns back to the filesystem
+    if migrated_any and db.engine.dialect.name == "sqlite":
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
@@ -0,0 +1,116 @@
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    # brotli is in requirements.txt. Without it, responses are only gzipped
+    brotli = None
+
+# Compresses /api/* responses for clients that accept it (Accept-Encoding), with brotli if the
+# brotli package is installed and the client prefers or accepts it, otherwise gzip.
+# - Only text formats (JSON, Prometheus metrics...) are compressed; images are already compressed
+# - Responses smaller than COMPRESSION_MIN_SIZE bytes aren't worth it and are sent as is
+# - Streamed responses are compressed chunk by chunk, each chunk flushed so the client can
+#   decode it right away
+# - Vary: Accept-Encoding tells caches that the body depends on that header
+# COMPRESSION=false turns it off; COMPRESSION_GZIP_LEVEL (1-9) and COMPRESSION_BROTLI_QUALITY
+# (0-11) trade CPU time for size.
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/css", "application/javascript"}
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+# quality 4-5 is about as fast as gzip -6 while still smaller
+DEFAULT_BROTLI_QUALITY = 4
+
+
+# Sets the compression config of the app from the environment
+def configure_compression(app, environ=os.environ):
+    app.config.setdefault('COMPRESSION', environ.get('COMPRESSION', 'true').lower() == 'true')
+    app.config.setdefault('COMPRESSION_MIN_SIZE', int(environ.get('COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)))
+    app.config.setdefault('COMPRESSION_GZIP_LEVEL', int(environ.get('COMPRESSION_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)))
+    app.config.setdefault('COMPRESSION_BROTLI_QUALITY', int(environ.get('COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)))
+
+
+# The best encoding the client accepts, "br", "gzip" or None
+def choose_encoding(accept_encodings):
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    best_quality = 0
+    for encoding in candidates:
+        # quality() is 0 if not accepted (or with q=0), and matches "*"
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+# Returns compress(chunk) -> bytes and finish() -> bytes for one response body
+def make_compressor(encoding, config):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config['COMPRESSION_BROTLI_QUALITY'])
+        return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+    # wbits 16 + MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(config['COMPRESSION_GZIP_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def compress_body(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    compressor = zlib.compressobj(config['COMPRESSION_GZIP_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+def compress_stream(chunks, encoding, config):
+    compress, finish = make_compressor(encoding, config)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk:
+                yield compress(chunk)
+        yield finish()
+    finally:
+        # let the wrapped body release its resources (e.g. a database cursor)
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+def compress_response(response, config):
+    if not request.path.startswith("/api/"):
+        return response
+    if response.status_code == 304:
+        # the client's cached copy may be compressed
+        response.vary.add("Accept-Encoding")
+        return response
+    if (
+        response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.status_code < 200 or response.status_code in (204, 206)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, config)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        response.set_data(compress_body(data, encoding, config))
+    response.headers["Content-Encoding"] = encoding
+
+    # the compressed body is different bytes, so a strong ETag no longer identifies it
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Compresses the app's responses if COMPRESSION is on
+def init_compression(app):
+    if not app.config.get('COMPRESSION'):
+        return
+    app.after_request(lambda response: compress_response(response, app.config))
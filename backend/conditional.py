@@ -0,0 +1,86 @@
+import hashlib
+from flask import current_app, request
+from sqlalchemy import exists, func, select
+from models import db, User, ItemListing, ItemLike, ItemOffer, ItemFacetCount, ForumPost, ForumComment
+from pagination import page_query
+from facets import apply_store_filters, price_range_subqueries
+
+# Conditional GET for the feeds and detail pages that clients poll.
+# Each response carries a weak ETag derived from a version of what it shows, which one small
+# query reads without loading or serializing any rows. A client sending that ETag back in
+# If-None-Match gets an empty 304 Not Modified if the version hasn't changed.
+# A version covers everything the response shows that can change: rows being added or deleted,
+# like and comment counters, availability, and the requesting user's likes and offers (listings,
+# posts, comments and user names can't be edited). Facet counts come from item_facet_count.
+# Ids alone don't identify a row: SQLite gives the highest id again after that row is deleted, so
+# each row is also identified by its created_at and, when it has one, its picture's hash.
+# Bump ETAG_FORMAT when a response format changes, so that clients don't keep old responses.
+
+ETAG_FORMAT = "1"
+
+
+def make_etag(version):
+    digest = hashlib.sha1(repr((ETAG_FORMAT, request.full_path, version)).encode("utf-8")).hexdigest()
+    return digest[:32]
+
+# A 304 response if the request's If-None-Match has the etag, otherwise None
+def not_modified_response(etag, private):
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(current_app.response_class(status=304), etag, private)
+
+# Sets the ETag and asks caches to revalidate every time (private ones only if private)
+def with_etag(response, etag, private):
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+
+# Version of a page of the forum feed
+def forum_feed_version(categories, limit, cursor):
+    query = db.session.query(func.printf(
+        "%d:%s:%s:%d:%d", ForumPost.id, ForumPost.created_at, ForumPost.photo_hash, ForumPost.comment_count, ForumPost.like_count
+    ))
+    if categories:
+        query = query.filter(ForumPost.category.in_(categories))
+    page = page_query(query, ForumPost.created_at, ForumPost.id, limit, cursor).subquery()
+    return db.session.execute(select(func.group_concat(*page.c))).scalar()
+
+# Version of a forum post with one page of its comments. A new comment is the post's latest,
+# and adding or deleting one changes comment_count
+def forum_post_version(post_id):
+    latest_comment = select(func.printf("%d:%s", ForumComment.id, ForumComment.created_at))\
+        .where(ForumComment.forum_post_id == post_id)\
+        .order_by(ForumComment.created_at.desc(), ForumComment.id.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    return db.session.execute(
+        select(ForumPost.created_at, ForumPost.photo_hash, ForumPost.comment_count, ForumPost.like_count, latest_comment)
+        .where(ForumPost.id == post_id)
+    ).first()
+
+# Version of a page of the store feed, as seen by user_id. The first page also has the facet counts
+def store_feed_version(filters, limit, cursor, user_id):
+    liked = exists().where(ItemLike.item_id == ItemListing.id, ItemLike.user_id == user_id)
+    query = db.session.query(func.printf(
+        "%d:%s:%s:%d:%d", ItemListing.id, ItemListing.created_at, ItemListing.picture_hash, ItemListing.like_count, liked
+    ))\
+        .filter(ItemListing.is_available == True)
+    query = apply_store_filters(query, filters)
+    page = page_query(query, ItemListing.created_at, ItemListing.id, limit, cursor).subquery()
+    columns = [select(func.group_concat(*page.c)).scalar_subquery()]
+    if not cursor:
+        columns.append(select(func.group_concat(ItemFacetCount.item_count)).scalar_subquery())
+        columns.extend(price_range_subqueries(filters))
+    return db.session.execute(select(*columns)).one()
+
+# Version of a store item, as seen by user_id
+def store_item_version(item_id, user_id):
+    liked = exists().where(ItemLike.item_id == item_id, ItemLike.user_id == user_id)
+    made_offer = exists().where(ItemOffer.item_id == item_id, ItemOffer.buyer_id == user_id)
+    return db.session.execute(
+        select(ItemListing.created_at, ItemListing.picture_hash, ItemListing.like_count, ItemListing.is_available,
+               User.name, User.profile_picture_url, liked, made_offer)
+        .join(User, User.id == ItemListing.user_id)
+        .where(ItemListing.id == item_id)
+    ).first()
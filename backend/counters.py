@@ -0,0 +1,36 @@
+from sqlalchemy import func, select
+from models import db, ItemListing, ItemLike, ForumPost, ForumComment, ForumLike
+
+# Like and comment counts are stored on the item listing / forum post rows, so reading them
+# is a column fetch instead of a COUNT over the likes or comments.
+# They are updated in SQL (count = count + 1) in the same transaction as the like or comment,
+# so concurrent requests can't lose an update. reconcile_counters() rebuilds them from scratch.
+
+
+# Both return the number of rows updated (0 if the item / post doesn't exist). Caller commits
+def change_item_like_count(item_id, delta):
+    return ItemListing.query\
+        .filter_by(id=item_id)\
+        .update({ItemListing.like_count: ItemListing.like_count + delta}, synchronize_session=False)
+
+def change_post_comment_count(post_id, delta):
+    return ForumPost.query\
+        .filter_by(id=post_id)\
+        .update({ForumPost.comment_count: ForumPost.comment_count + delta}, synchronize_session=False)
+
+# (table, counter column, source table, source foreign key)
+COUNTERS = [
+    (ItemListing, ItemListing.like_count, ItemLike, ItemLike.item_id),
+    (ForumPost, ForumPost.like_count, ForumLike, ForumLike.forum_post_id),
+    (ForumPost, ForumPost.comment_count, ForumComment, ForumComment.forum_post_id),
+]
+
+# Recomputes every counter from the likes and comments tables, e.g. after bulk loading data
+def reconcile_counters():
+    for model, counter_column, source_model, source_column in COUNTERS:
+        actual_count = select(func.count())\
+            .select_from(source_model)\
+            .where(source_column == model.id)\
+            .scalar_subquery()
+        db.session.query(model).update({counter_column: actual_count}, synchronize_session=False)
+    db.session.commit()
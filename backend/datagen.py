@@ -0,0 +1,321 @@
+import itertools
+import os
+import random
+import time
+from sqlalchemy import text
+from models import db
+from blobstore import put_blob
+from images import make_variants
+from counters import reconcile_counters
+from search import rebuild_search_index
+from facets import rebuild_facet_counts
+
+# Generates a large synthetic dataset for load and scale testing (see `flask generate-data`).
+# Rows are inserted with batched executemany on the raw connection, with explicit ids, so the
+# generator never reads back what it wrote. Activity is skewed the way real usage is: a few users
+# list most items, a few items get most likes and offers, a few threads get most comments.
+# Every listing and photo reuses the images in mock_data_images, stored once in the blob store.
+# The indexes and sync triggers (search index, facet counts) of the tables are dropped during the
+# load, and the derived data (counters, facet counts, search index, blob refcounts) is rebuilt once
+# at the end.
+
+MOCK_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_data_images")
+BATCH_SIZE = 20000
+# higher is more skewed: weight of the n-th most popular row is 1 / n^POWER_LAW_EXPONENT
+POWER_LAW_EXPONENT = 1.1
+# generated rows are spread over this many days before now
+HISTORY_DAYS = 365
+TEXT_POOL_SIZE = 1000
+
+CATEGORIES = ["Jackets", "Tops", "Bottoms", "Shoes", "Hats", "Accessories", "Misc"]
+COLORS = ["Red", "Green", "Blue", "Yellow", "Purple", "Orange", "Pink", "Brown", "Gray", "Black", "White"]
+SIZES = ["XS", "S", "M", "L", "XL", ""]
+GENDERS = ["Men", "Women", "Gender Neutral"]
+CONDITIONS = ["Excellent", "Good", "Fair"]
+FORUM_CATEGORIES = ["General", "Announcement", "Event", "Fitcheck"]
+# (status, share of offers)
+OFFER_STATUSES = [("Pending", 50), ("Accepted", 15), ("Declined", 20), ("Completed", 10), ("Cancelled", 5)]
+
+ADJECTIVES = ["Vintage", "Classic", "Oversized", "Cropped", "Wool", "Denim", "Linen", "Leather", "Striped",
+              "Graphic", "Retro", "Cozy", "Lightweight", "Thrifted", "Handmade", "Corduroy"]
+NOUNS = {
+    "Jackets": ["Jacket", "Blazer", "Puffer", "Windbreaker", "Coat"],
+    "Tops": ["T-Shirt", "Sweater", "Hoodie", "Blouse", "Tank Top", "Cardigan"],
+    "Bottoms": ["Jeans", "Trousers", "Skirt", "Shorts", "Cargo Pants"],
+    "Shoes": ["Sneakers", "Boots", "Loafers", "Sandals"],
+    "Hats": ["Beanie", "Cap", "Bucket Hat"],
+    "Accessories": ["Scarf", "Tote Bag", "Belt", "Sunglasses"],
+    "Misc": ["Patch Set", "Pin", "Keychain"],
+}
+WORDS = ("the a this great fits perfect worn condition size color swap thrift campus style sustainable "
+         "fabric vintage find anyone looking trade event fashion outfit sale looks love wear").split()
+
+
+# Cumulative weights of a power law over n rows, for random.choices(..., cum_weights=...)
+def power_law_weights(n):
+    return list(itertools.accumulate(1 / (rank ** POWER_LAW_EXPONENT) for rank in range(1, n + 1)))
+
+# Splits total into n counts following the power law, none above cap (a listing can't be liked
+# by more users than there are), by raising the top counts to cap until the rest fit under it
+def power_law_counts(n, total, cap, rng):
+    weights = [1 / (rank ** POWER_LAW_EXPONENT) for rank in range(1, n + 1)]
+    total = min(total, n * cap)
+    capped = 0
+    remaining_weight = sum(weights)
+    while capped < n and (total - capped * cap) * weights[capped] / remaining_weight > cap:
+        remaining_weight -= weights[capped]
+        capped += 1
+    scale = (total - capped * cap) / remaining_weight if capped < n else 0
+    counts = [cap] * capped + [int(scale * weight) for weight in weights[capped:]]
+    # hand out what rounding down left over
+    for _ in range(total - sum(counts)):
+        index = rng.randrange(capped, n)
+        while counts[index] >= cap:
+            index = rng.randrange(capped, n)
+        counts[index] += 1
+    return counts
+
+# Random text is picked from a pool of sentences, since making a new one for every row is slow
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def next_id(table):
+    return (db.session.execute(text(f"SELECT max(id) FROM {table}")).scalar() or 0) + 1
+
+# Inserts rows (tuples in the order of columns) in batches. created_at values are Unix times,
+# formatted by SQLite, which is a lot faster than formatting them in Python
+def insert_rows(table, columns, rows):
+    values = ["datetime(?, 'unixepoch')" if column == "created_at" else "?" for column in columns]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values)})"
+    connection = db.session.connection()
+    count = 0
+    for batch in chunks(rows):
+        connection.exec_driver_sql(sql, batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+def chunks(rows):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        yield batch
+
+# Stores each mock image and its variants once. Returns [(image hash, {size: (hash, width, height)})]
+def store_mock_images():
+    images = []
+    for name in sorted(os.listdir(MOCK_IMAGES_DIR)):
+        with open(os.path.join(MOCK_IMAGES_DIR, name), "rb") as f:
+            data = f.read()
+        variants = {
+            size: (put_blob(variant_data), width, height)
+            for size, (variant_data, width, height) in make_variants(data).items()
+        }
+        images.append((put_blob(data), variants))
+    db.session.commit()
+    return images
+
+def variant_rows(owner_type, owner_ids_and_images, first_id, created_at):
+    row_id = first_id
+    for owner_id, (_, variants) in owner_ids_and_images:
+        for size, (blob_hash, width, height) in variants.items():
+            yield (row_id, owner_type, owner_id, size, width, height, blob_hash, created_at)
+            row_id += 1
+
+
+def drop_sync_triggers():
+    triggers = db.session.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all()
+    for name, _ in triggers:
+        db.session.execute(text(f"DROP TRIGGER {name}"))
+    db.session.commit()
+    return [sql for _, sql in triggers]
+
+def restore_sync_triggers(trigger_sql):
+    for sql in trigger_sql:
+        db.session.execute(text(sql))
+    db.session.commit()
+
+# Secondary indexes are dropped during the load and built again afterwards: building an index
+# from the finished table is much faster than updating it for every row inserted in random order
+def drop_indexes(tables):
+    indexes = [index for table in tables for index in db.metadata.tables[table].indexes]
+    db.session.commit()
+    for index in indexes:
+        index.drop(db.engine, checkfirst=True)
+    return indexes
+
+def create_indexes(indexes):
+    for index in indexes:
+        index.create(db.engine, checkfirst=True)
+
+# Sets the refcount of every referenced blob to the number of rows referencing it
+def reconcile_blob_refcounts():
+    db.session.execute(text("""
+        UPDATE blob SET refcount = refs.count
+        FROM (
+            SELECT hash, count(*) AS count FROM (
+                SELECT picture_hash AS hash FROM item_listing
+                UNION ALL SELECT photo_hash FROM forum_post WHERE photo_hash IS NOT NULL
+                UNION ALL SELECT blob_hash FROM image_variant
+            ) GROUP BY hash
+        ) AS refs
+        WHERE refs.hash = blob.hash
+    """))
+    db.session.commit()
+
+
+def generate_data(users=10000, listings=200000, likes=2000000, offers=500000, posts=100000,
+                  comments=1000000, seed=None, log=print):
+    rng = random.Random(seed)
+    span = HISTORY_DAYS * 24 * 3600
+    start = int(time.time()) - span
+    timings = {}
+    texts = {words: [sentence(rng, words) for _ in range(TEXT_POOL_SIZE)] for words in (6, 8, 12, 15, 40)}
+
+    def step(name):
+        timings[name] = time.perf_counter()
+        log(f"Generating {name}...")
+
+    def done(name, count):
+        log(f"  {count} {name} in {time.perf_counter() - timings[name]:.1f}s")
+
+    total_start = time.perf_counter()
+    trigger_sql = drop_sync_triggers()
+    indexes = drop_indexes(["item_listing", "item_like", "item_offer", "forum_post", "forum_comment", "image_variant"])
+    try:
+        images = store_mock_images()
+
+        # users: ids first_user .. first_user + users - 1, the lower ids are the most active
+        step("users")
+        first_user = next_id("user")
+        user_ids = range(first_user, first_user + users)
+        user_weights = power_law_weights(users)
+        done("users", insert_rows(
+            "user", ["id", "name", "email", "created_at", "bio", "profile_picture_url"],
+            ((user_id, f"Test User {user_id}", f"user{user_id}@example.com", start + rng.randrange(span),
+              rng.choice(texts[8]), "") for user_id in user_ids),
+        ))
+
+        # listings, in created_at order; sellers are skewed
+        step("listings")
+        first_listing = next_id("item_listing")
+        listing_ids = range(first_listing, first_listing + listings)
+        sellers = rng.choices(user_ids, cum_weights=user_weights, k=listings)
+        listing_images = [rng.choice(images) for _ in listing_ids]
+
+        def listing_rows():
+            for index, listing_id in enumerate(listing_ids):
+                category = rng.choice(CATEGORIES)
+                yield (
+                    listing_id, f"{rng.choice(ADJECTIVES)} {rng.choice(COLORS)} {rng.choice(NOUNS[category])}",
+                    sellers[index], rng.choice(texts[15]), round(rng.lognormvariate(3, 0.7), 2),
+                    start + span * index // listings, rng.choice(COLORS), rng.choice(SIZES),
+                    rng.choice(GENDERS), rng.choice(CONDITIONS), category, listing_images[index][0], True,
+                )
+        done("listings", insert_rows(
+            "item_listing",
+            ["id", "title", "user_id", "description", "price", "created_at", "color", "size", "gender",
+             "condition", "category", "picture_hash", "is_available"],
+            listing_rows(),
+        ))
+        insert_rows(
+            "image_variant",
+            ["id", "owner_type", "owner_id", "size", "width", "height", "blob_hash", "created_at"],
+            variant_rows("item", zip(listing_ids, listing_images), next_id("image_variant"), start + span),
+        )
+
+        # likes: the listings in a random order get power law like counts, each from distinct users
+        step("likes")
+        popular_listings = list(listing_ids)
+        rng.shuffle(popular_listings)
+        listing_weights = power_law_weights(listings)
+        like_counts = power_law_counts(listings, likes, users, rng)
+        done("likes", insert_rows(
+            "item_like", ["item_id", "user_id", "created_at"],
+            (
+                (item_id, user_id, start + rng.randrange(span))
+                for item_id, count in zip(popular_listings, like_counts)
+                for user_id in rng.sample(user_ids, count)
+            ),
+        ))
+
+        # offers, mostly on the popular listings
+        step("offers")
+        statuses = rng.choices([status for status, _ in OFFER_STATUSES], weights=[share for _, share in OFFER_STATUSES], k=offers)
+        offer_listings = rng.choices(popular_listings, cum_weights=listing_weights, k=offers)
+        buyers = rng.choices(user_ids, cum_weights=user_weights, k=offers)
+
+        def offer_rows():
+            for index in range(offers):
+                listing_id = offer_listings[index]
+                seller = sellers[listing_id - first_listing]
+                buyer = buyers[index] if buyers[index] != seller else rng.choice(user_ids)
+                if buyer == seller:
+                    continue
+                status = statuses[index]
+                completed = status == "Completed"
+                accepted = completed or (status == "Accepted" and rng.random() < 0.3)
+                yield (listing_id, buyer, seller, round(rng.uniform(5, 100), 2), start + rng.randrange(span),
+                       status, completed or accepted and rng.random() < 0.5, completed)
+        done("offers", insert_rows(
+            "item_offer",
+            ["item_id", "buyer_id", "seller_id", "offer_amount", "created_at", "status", "buyer_completed", "seller_completed"],
+            offer_rows(),
+        ))
+        # sold listings are no longer available
+        db.session.execute(text(
+            "UPDATE item_listing SET is_available = 0 WHERE id IN (SELECT item_id FROM item_offer WHERE status = 'Completed')"
+        ))
+        db.session.commit()
+
+        # forum posts, one in five with a photo
+        step("posts")
+        first_post = next_id("forum_post")
+        post_ids = range(first_post, first_post + posts)
+        authors = rng.choices(user_ids, cum_weights=user_weights, k=posts)
+        post_images = {post_id: rng.choice(images) for post_id in post_ids if rng.random() < 0.2}
+        done("posts", insert_rows(
+            "forum_post", ["id", "title", "user_id", "content", "category", "photo_hash", "created_at"],
+            ((post_id, rng.choice(texts[6]), authors[post_id - first_post], rng.choice(texts[40]),
+              rng.choice(FORUM_CATEGORIES), post_images[post_id][0] if post_id in post_images else None,
+              start + span * (post_id - first_post) // posts) for post_id in post_ids),
+        ))
+        insert_rows(
+            "image_variant",
+            ["id", "owner_type", "owner_id", "size", "width", "height", "blob_hash", "created_at"],
+            variant_rows("post", post_images.items(), next_id("image_variant"), start + span),
+        )
+
+        # comments: a few hot threads get most of them, always after the post
+        step("comments")
+        hot_posts = list(post_ids)
+        rng.shuffle(hot_posts)
+        comment_posts = rng.choices(hot_posts, cum_weights=power_law_weights(posts), k=comments)
+        commenters = rng.choices(user_ids, cum_weights=user_weights, k=comments)
+
+        def comment_rows():
+            for index, post_id in enumerate(comment_posts):
+                post_offset = span * (post_id - first_post) // posts
+                yield (post_id, commenters[index], rng.choice(texts[12]),
+                       start + post_offset + rng.randrange(max(1, span - post_offset)))
+        done("comments", insert_rows(
+            "forum_comment", ["forum_post_id", "user_id", "content", "created_at"], comment_rows(),
+        ))
+    finally:
+        # also after a failure, so that the database keeps its indexes and triggers
+        db.session.rollback()
+        step("indexes")
+        create_indexes(indexes)
+        restore_sync_triggers(trigger_sql)
+        done("indexes", len(indexes))
+
+    step("derived data")
+    reconcile_blob_refcounts()
+    reconcile_counters()
+    rebuild_facet_counts()
+    rebuild_search_index()
+    # refresh the query planner's statistics for the new data
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+    done("derived data", "rebuilt")
+    log(f"Done in {time.perf_counter() - total_start:.1f}s")
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from models import db
+
+# Database engine settings.
+# DATABASE_URL overrides the default SQLite file. SQLite connections get these PRAGMAs every time
+# they are opened (they're per connection, not stored in the database file, except journal_mode):
+# - journal_mode=WAL: readers don't block the writer and the writer doesn't block readers
+# - synchronous=NORMAL: with WAL, only a checkpoint waits for fsync, not every commit. A power
+#   loss can lose the last commits but can't corrupt the database
+# - busy_timeout: wait this long (ms) for a lock instead of failing with "database is locked"
+# - cache_size: page cache per connection, negative is KiB
+# - mmap_size: read the database through memory-mapped I/O, up to this many bytes
+# - temp_store=MEMORY: temporary tables and indexes (e.g. for sorting) stay in memory
+# Each can be changed with the SQLITE_<NAME> environment variable (e.g. SQLITE_BUSY_TIMEOUT=10000);
+# SQLITE_PRAGMAS=off turns them all off.
+
+DEFAULT_DATABASE_URL = 'sqlite:///database.db'
+
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+def sqlite_pragmas_from_env(environ):
+    if environ.get("SQLITE_PRAGMAS", "").lower() == "off":
+        return {}
+    return {
+        name: environ.get(f"SQLITE_{name.upper()}", default)
+        for name, default in DEFAULT_SQLITE_PRAGMAS.items()
+    }
+
+# Sets the database config of the app from the environment, to be called before db.init_app
+def configure_database(app, environ=os.environ):
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', environ.get('DATABASE_URL', DEFAULT_DATABASE_URL))
+    app.config.setdefault('SQLITE_PRAGMAS', sqlite_pragmas_from_env(environ))
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+# Applies the app's SQLITE_PRAGMAS to every new connection of its SQLite engines,
+# to be called after db.init_app
+def init_engine(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != "sqlite":
+                continue
+
+            @event.listens_for(engine, "connect")
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                if isinstance(dbapi_connection, sqlite3.Connection):
+                    apply_sqlite_pragmas(dbapi_connection, pragmas)
@@ -0,0 +1,21 @@
+from models import db, ItemLike
+
+
+# Adds "liked" to a list of serialized items: whether the authenticated user has liked each one.
+# Uses one IN query for the whole list, so the number of queries does not grow with the number
+# of items. ("like_count" is already part of ItemListing.serialize, see counters.py)
+def attach_like_data(items_list, auth_user_id):
+    item_ids = [item["id"] for item in items_list]
+    if not item_ids:
+        return items_list
+
+    # items (out of this list) that the authenticated user has liked
+    liked_item_ids = {
+        item_id for (item_id,) in db.session.query(ItemLike.item_id)
+        .filter(ItemLike.item_id.in_(item_ids), ItemLike.user_id == auth_user_id)
+        .all()
+    }
+
+    for item in items_list:
+        item["liked"] = item["id"] in liked_item_ids
+    return items_list
@@ -0,0 +1,150 @@
+from sqlalchemy import DDL, event, func, select, text
+from models import db, ItemListing, ItemFacetCount
+
+# Store item attributes that can be filtered on, e.g. ?color=Blue&color=Black&size=M
+FACET_COLUMNS = {
+    "category": ItemListing.category,
+    "size": ItemListing.size,
+    "color": ItemListing.color,
+    "gender": ItemListing.gender,
+    "condition": ItemListing.condition,
+}
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+# Reads facet values and ?min_price= / ?max_price= from the request args.
+# Values within a facet are OR'ed together, different facets are AND'ed.
+def parse_store_filters(args):
+    filters = {}
+    for facet in FACET_COLUMNS:
+        values = [value for value in args.getlist(facet) if value != ""]
+        if values:
+            filters[facet] = values
+
+    price_range = []
+    for arg in ("min_price", "max_price"):
+        value = args.get(arg)
+        if value in (None, ""):
+            price_range.append(None)
+            continue
+        try:
+            price_range.append(float(value))
+        except ValueError as e:
+            raise InvalidFilter(f"Invalid {arg}: {value}") from e
+    filters["price"] = tuple(price_range)
+    return filters
+
+# Adds the WHERE clauses for the filters to a query (or select).
+# exclude_facet leaves one facet's own filter out, which is what its counts are computed with
+def apply_store_filters(query, filters, exclude_facet=None):
+    for facet, column in FACET_COLUMNS.items():
+        if facet != exclude_facet and facet in filters:
+            query = query.filter(column.in_(filters[facet]))
+
+    min_price, max_price = filters.get("price", (None, None))
+    if min_price is not None:
+        query = query.filter(ItemListing.price >= min_price)
+    if max_price is not None:
+        query = query.filter(ItemListing.price <= max_price)
+    return query
+
+# Keep item_facet_count in sync with item_listing on every insert, update and delete,
+# counting only available items
+FACET_MATCHES_OLD = " AND ".join(f"{facet} = OLD.{facet}" for facet in FACET_COLUMNS)
+FACET_NAMES = ", ".join(FACET_COLUMNS)
+NEW_FACET_VALUES = ", ".join(f"NEW.{facet}" for facet in FACET_COLUMNS)
+
+FACET_COUNT_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS item_listing_facet_count_insert AFTER INSERT ON item_listing
+    WHEN NEW.is_available
+    BEGIN
+        INSERT INTO item_facet_count ({FACET_NAMES}, item_count) VALUES ({NEW_FACET_VALUES}, 1)
+        ON CONFLICT DO UPDATE SET item_count = item_count + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS item_listing_facet_count_delete AFTER DELETE ON item_listing
+    WHEN OLD.is_available
+    BEGIN
+        UPDATE item_facet_count SET item_count = item_count - 1 WHERE {FACET_MATCHES_OLD};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS item_listing_facet_count_update
+    AFTER UPDATE OF is_available, {FACET_NAMES} ON item_listing
+    BEGIN
+        UPDATE item_facet_count SET item_count = item_count - 1 WHERE OLD.is_available AND {FACET_MATCHES_OLD};
+        INSERT INTO item_facet_count ({FACET_NAMES}, item_count) SELECT {NEW_FACET_VALUES}, 1 WHERE NEW.is_available
+        ON CONFLICT DO UPDATE SET item_count = item_count + 1;
+    END
+    """,
+]
+
+# create the triggers along with the tables
+for trigger in FACET_COUNT_TRIGGERS:
+    event.listen(db.metadata, "after_create", DDL(trigger).execute_if(dialect="sqlite"))
+
+# Recomputes item_facet_count from item_listing, e.g. after bulk loading listings
+def rebuild_facet_counts():
+    db.session.execute(text("DELETE FROM item_facet_count"))
+    db.session.execute(text(
+        f"INSERT INTO item_facet_count ({FACET_NAMES}, item_count) "
+        f"SELECT {FACET_NAMES}, count(*) FROM item_listing WHERE is_available GROUP BY {FACET_NAMES}"
+    ))
+    db.session.commit()
+
+
+# Counts of available items for every value of every facet, e.g. {"color": {"Blue": 3, ...}, ...},
+# plus the price range of the matching items.
+# Each facet is counted with all the other filters applied but not its own, so picking
+# another value of the same facet shows how many items that would add.
+#
+# Rather than one GROUP BY per facet, this reads one count per combination of facet values
+# (a few thousand rows at most) and adds them up for each facet in Python. Without a price
+# filter the combinations come from item_facet_count, with one they are counted from the
+# listings in the price range using the ix_item_listing_available_price_facets covering index.
+def get_facet_counts(filters):
+    facets = list(FACET_COLUMNS)
+    min_price, max_price = filters.get("price", (None, None))
+    if min_price is None and max_price is None:
+        cells = db.session.execute(
+            select(*[getattr(ItemFacetCount, facet) for facet in facets], ItemFacetCount.item_count)
+            .where(ItemFacetCount.item_count > 0)
+        ).all()
+    else:
+        facet_columns = list(FACET_COLUMNS.values())
+        cells_select = select(*facet_columns, func.count()).where(ItemListing.is_available == True)
+        cells_select = apply_store_filters(cells_select, {"price": (min_price, max_price)})
+        cells = db.session.execute(cells_select.group_by(*facet_columns)).all()
+
+    facet_counts = {facet: {} for facet in facets}
+    for cell in cells:
+        values = dict(zip(facets, cell))
+        count = cell[len(facets)]
+        # facets whose filter this combination of values doesn't match
+        unmatched = [facet for facet in facets if facet in filters and values[facet] not in filters[facet]]
+        # a combination counts toward a facet if it matches every filter except (maybe) that facet's own
+        for facet in facets:
+            if not unmatched or unmatched == [facet]:
+                facet_counts[facet][values[facet]] = facet_counts[facet].get(values[facet], 0) + count
+
+    facet_counts["price"] = get_price_range(filters)
+    return facet_counts
+
+# Cheapest and most expensive available items matching every filter but the price itself.
+# Walks the price index from either end until the first matching item instead of scanning
+def get_price_range(filters):
+    min_price, max_price = db.session.execute(select(*price_range_subqueries(filters))).one()
+    return {"min": min_price, "max": max_price}
+
+# (cheapest, priciest) scalar subqueries of get_price_range
+def price_range_subqueries(filters):
+    facet_filters = {**filters, "price": (None, None)}
+    cheapest = apply_store_filters(select(ItemListing.price).where(ItemListing.is_available == True), facet_filters)
+    priciest = cheapest.order_by(ItemListing.price.desc()).limit(1).scalar_subquery()
+    cheapest = cheapest.order_by(ItemListing.price.asc()).limit(1).scalar_subquery()
+    return cheapest, priciest
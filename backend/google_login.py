@@ -0,0 +1,153 @@
+import email.utils
+import json
+import re
+import threading
+import time
+import requests
+from google.auth import jwt as google_jwt
+from metrics import record_cache_lookup
+
+# Verifies the Google ID tokens sent to /api/login.
+# google.oauth2.id_token.verify_oauth2_token opens a new connection and downloads Google's
+# signing certs on every call. Here the certs come from a "cert source" that is created once:
+# - HttpCertSource fetches them over one pooled requests.Session and keeps them for as long as
+#   Google's Cache-Control / Expires headers allow (usually several hours)
+# - StaticCertSource serves a fixed key set (e.g. a local stand-in loaded with GOOGLE_CERTS_FILE),
+#   so logins can be verified fully offline
+# The token checks themselves (signature, exp/iat, audience, issuer) are the same as google-auth's.
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+# Used when the certs response has no usable cache headers
+DEFAULT_CERTS_MAX_AGE = 300
+# If refreshing fails, keep using the certs we have for up to this long after they expired
+STALE_CERTS_GRACE = 3600
+# A token signed with a key we don't know triggers an early refresh at most this often
+MIN_REFRESH_INTERVAL = 60
+CERTS_FETCH_TIMEOUT = 10
+
+
+class CertsUnavailable(Exception):
+    pass
+
+
+# Number of seconds the response may be cached for, from Cache-Control max-age or Expires
+def cache_lifetime(headers, now):
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return max(0, int(match.group(1)) - int(headers.get("Age", 0) or 0))
+    if headers.get("Expires"):
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+            return max(0, expires - now)
+        except (TypeError, ValueError):
+            pass
+    return DEFAULT_CERTS_MAX_AGE
+
+
+class HttpCertSource:
+    def __init__(self, url=GOOGLE_CERTS_URL, session=None):
+        self.url = url
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        self.session = session
+        self.certs = None
+        self.expires_at = 0
+        self.fetched_at = 0
+        # after a failed refresh, stale certs are served without retrying until then
+        self.retry_at = 0
+        # one refresh at a time, so a burst of logins after expiry causes a single download
+        self.lock = threading.Lock()
+        self.stats = {"fetches": 0, "fetch_errors": 0}
+
+    def usable(self, now):
+        if self.certs is None:
+            return False
+        return now < self.expires_at or (now < self.retry_at and now < self.expires_at + STALE_CERTS_GRACE)
+
+    def get_certs(self, force_refresh=False):
+        if not force_refresh and self.usable(time.time()):
+            record_cache_lookup("google_certs", "hit")
+            return self.certs
+
+        with self.lock:
+            now = time.time()
+            # another thread may have refreshed while we were waiting
+            if force_refresh:
+                if now - self.fetched_at < MIN_REFRESH_INTERVAL or now < self.retry_at:
+                    return self.certs
+            elif self.usable(now):
+                return self.certs
+
+            try:
+                self.fetch(now)
+            except (requests.RequestException, ValueError) as e:
+                self.stats["fetch_errors"] += 1
+                self.retry_at = now + MIN_REFRESH_INTERVAL
+                if self.certs is not None and now < self.expires_at + STALE_CERTS_GRACE:
+                    print(f"WARNING: could not refresh Google certs, using cached ones: {e}")
+                    return self.certs
+                raise CertsUnavailable(f"Could not fetch Google certs: {e}") from e
+            return self.certs
+
+    def fetch(self, now):
+        record_cache_lookup("google_certs", "miss")
+        response = self.session.get(self.url, timeout=CERTS_FETCH_TIMEOUT)
+        response.raise_for_status()
+        certs = response.json()
+        if not isinstance(certs, dict) or not certs:
+            raise ValueError("Unexpected certs response")
+        self.stats["fetches"] += 1
+        self.certs = certs
+        self.fetched_at = now
+        self.expires_at = now + cache_lifetime(response.headers, now)
+
+
+class StaticCertSource:
+    # certs: {key id: PEM certificate or public key}
+    def __init__(self, certs):
+        self.certs = dict(certs)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def get_certs(self, force_refresh=False):
+        return self.certs
+
+
+# GOOGLE_CERTS_FILE points at a local JSON key set, otherwise the certs are fetched from Google
+def cert_source_from_env(environ):
+    certs_file = environ.get("GOOGLE_CERTS_FILE")
+    if certs_file:
+        return StaticCertSource.from_file(certs_file)
+    return HttpCertSource(environ.get("GOOGLE_CERTS_URL", GOOGLE_CERTS_URL))
+
+
+class GoogleTokenVerifier:
+    def __init__(self, client_id, cert_source, clock_skew=10):
+        self.client_id = client_id
+        self.cert_source = cert_source
+        self.clock_skew = clock_skew
+
+    # Returns the token's claims. Raises ValueError for an invalid token and
+    # CertsUnavailable if the certs can't be loaded
+    def verify(self, token):
+        certs = self.cert_source.get_certs()
+        key_id = google_jwt.decode_header(token).get("kid")
+        if key_id not in certs:
+            # Google may have rotated its keys before our cached copy expired
+            certs = self.cert_source.get_certs(force_refresh=True)
+
+        idinfo = google_jwt.decode(
+            token, certs=certs, audience=self.client_id, clock_skew_in_seconds=self.clock_skew
+        )
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+        return idinfo
@@ -0,0 +1,73 @@
+# gunicorn settings for the backend, see wsgi.py. Each can be overridden with an environment variable.
+#
+# - Pre-fork workers (processes), each running a few threads: requests mostly wait on SQLite and
+#   disk, so threads keep a worker busy while one of them waits.
+# - preload_app imports the app once in the master before forking, so workers start fast and share
+#   memory, and the schema migrations run once, in the master (see wsgi.py). Gunicorn then can't
+#   reload the app code on SIGHUP, so deploy by restarting the container.
+#   GUNICORN_PRELOAD=false makes every worker import the app itself, so that `kill -HUP <master pid>`
+#   loads new code. Workers would then all run the migrations at the same time, and migrations are
+#   not safe to run concurrently (add_column checks for the column, then adds it). Instead, the
+#   master runs them first, in a separate `flask migrate-db` process so that it doesn't import the
+#   app, on start and on every SIGHUP, before starting the workers. Don't start several gunicorn
+#   masters (or `flask migrate-db`) on the same database at once.
+# - `kill -HUP <master pid>` starts new workers and gracefully stops the old ones (they finish their
+#   requests, up to graceful_timeout).
+# - max_requests recycles workers now and then, with jitter so they don't all restart together.
+# - The workers' Prometheus metrics are written to PROMETHEUS_MULTIPROC_DIR, so that /api/metrics
+#   can add them up (see metrics.py). It's emptied when gunicorn starts.
+import glob
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+# must be set before the app (and prometheus_client) is imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "backend-metrics"))
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# seconds to keep an idle client connection open for its next request
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# set GUNICORN_ACCESS_LOG= (empty) to turn the access log off
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+# Without preload_app, runs the migrations (and seeds an empty database if SEED_MOCK_DATA=true, as
+# wsgi.py does) before any worker starts. The workers then find the schema up to date
+def migrate_database(server):
+    if server.cfg.preload_app:
+        return
+    command = "seed" if os.getenv("SEED_MOCK_DATA", "false").lower() == "true" else "migrate-db"
+    # the process's metrics would be added to the workers'
+    environ = {name: value for name, value in os.environ.items() if name != "PROMETHEUS_MULTIPROC_DIR"}
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "app", command],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env={**environ, "METRICS": "false"}, check=True,
+    )
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    # metrics of a previous run
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+    migrate_database(server)
+
+def on_reload(server):
+    migrate_database(server)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,45 @@
+from models import db, ItemListing, ForumPost, ImageVariant
+from images import make_variants
+from blobstore import put_blob, read_blob, release_blobs
+
+# Resized variants (see images.VARIANT_SIZES) of item listing and forum post images,
+# stored in the blob store and recorded in the image_variant table
+
+
+# Generates the resized variants of an item/post image and adds them to the session (caller commits)
+def add_image_variants(owner_type, owner_id, data):
+    for size, (variant_data, width, height) in make_variants(data).items():
+        db.session.add(ImageVariant(
+            owner_type=owner_type,
+            owner_id=owner_id,
+            size=size,
+            width=width,
+            height=height,
+            blob_hash=put_blob(variant_data),
+        ))
+
+# Releases the original image and variants of an item/post from the blob store (caller commits).
+# Returns the released blob hashes, to pass to remove_unreferenced_blobs after the commit
+def release_image(owner_type, owner_id, original_hash):
+    variant_hashes = [
+        blob_hash for (blob_hash,) in db.session.query(ImageVariant.blob_hash)
+        .filter_by(owner_type=owner_type, owner_id=owner_id)
+        .all()
+    ]
+    ImageVariant.query.filter_by(owner_type=owner_type, owner_id=owner_id).delete()
+    released_hashes = variant_hashes + [original_hash]
+    release_blobs(released_hashes)
+    return released_hashes
+
+# Generates variants for any item listing or forum post image that doesn't have them yet
+def backfill_image_variants():
+    have_variants = db.session.query(ImageVariant.owner_type, ImageVariant.owner_id).distinct().all()
+    have_variants = set(have_variants)
+
+    for item_id, picture_hash in db.session.query(ItemListing.id, ItemListing.picture_hash).all():
+        if ("item", item_id) not in have_variants:
+            add_image_variants("item", item_id, read_blob(picture_hash))
+    for post_id, photo_hash in db.session.query(ForumPost.id, ForumPost.photo_hash).filter(ForumPost.photo_hash.isnot(None)).all():
+        if ("post", post_id) not in have_variants:
+            add_image_variants("post", post_id, read_blob(photo_hash))
+    db.session.commit()
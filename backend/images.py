@@ -0,0 +1,94 @@
+import io
+from flask import send_file
+from PIL import Image, ImageOps
+
+# An image URL with its hash always gets the same image, so browsers can keep it for a year
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# (magic bytes, mimetype) used to tell what kind of image an upload is
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def guess_image_mimetype(data):
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+# Resized copies generated at upload time, by longest side in pixels.
+# Fetch one with /api/images/<item|post>/<id>/<hash>?size=<name>, the original is served without size=
+VARIANT_SIZES = {
+    "thumb": 200,
+    "card": 480,
+    "full": 1600,
+}
+VARIANT_QUALITY = {
+    "thumb": 75,
+    "card": 80,
+    "full": 85,
+}
+
+
+# Resizes and re-encodes an uploaded image as a JPEG for every size in VARIANT_SIZES.
+# Returns {size: (jpeg_bytes, width, height)}, or {} if the data can't be decoded as an image.
+def make_variants(data):
+    try:
+        original = Image.open(io.BytesIO(data))
+        # apply the camera's orientation tag, since it's dropped when re-encoding
+        original = ImageOps.exif_transpose(original)
+    except (OSError, Image.DecompressionBombError) as e:
+        print(f"Warning: could not decode image for variants: {e}")
+        return {}
+
+    # JPEG has no alpha channel, so flatten transparent images onto white
+    if original.mode in ("RGBA", "LA", "P"):
+        original = original.convert("RGBA")
+        background = Image.new("RGB", original.size, (255, 255, 255))
+        background.paste(original, mask=original.getchannel("A"))
+        original = background
+    elif original.mode != "RGB":
+        original = original.convert("RGB")
+
+    variants = {}
+    for size, max_side in VARIANT_SIZES.items():
+        image = original.copy()
+        # only ever shrink, never upscale small uploads
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=VARIANT_QUALITY[size], optimize=True, progressive=True)
+        variant_data = buffer.getvalue()
+        # keep an uploaded JPEG as is when it's already small enough and re-encoding only made it bigger
+        if image.size == original.size and len(variant_data) >= len(data) and guess_image_mimetype(data) == "image/jpeg":
+            variant_data = data
+        variants[size] = (variant_data, image.width, image.height)
+    return variants
+
+# Builds a response that streams an image file from disk.
+# Sets a strong ETag and answers If-None-Match / Range requests.
+# immutable=True (the URL has the image's hash) lets browsers keep it for a year without asking
+# again; otherwise they revalidate it with the ETag every time, since the same URL can get a
+# different image (ids are reused after a delete).
+# private=True keeps shared caches from storing images that require authentication.
+def image_response(path, etag, content_type, private=False, immutable=False):
+    response = send_file(
+        path,
+        mimetype=content_type,
+        etag=etag,
+        max_age=IMAGE_MAX_AGE if immutable else 0,
+        conditional=True,
+    )
+    if private:
+        response.cache_control.public = False
+        response.cache_control.private = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,98 @@
+import base64
+import dataclasses
+import decimal
+import os
+import uuid
+from datetime import date, time
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    # without orjson, JSON goes through the standard library with the same output
+    orjson = None
+
+# The app's JSON provider, used by jsonify and request.get_json.
+# Serializes the types the models return the same way whichever provider is used:
+# - datetimes, dates and times as ISO 8601 (e.g. "2025-04-01T12:30:00"), the models return them as is
+# - Decimals and UUIDs as strings
+# - bytes as base64
+# - dataclasses as objects
+# JSON_PROVIDER picks the implementation: "orjson" (the default if orjson is installed) serializes
+# in C straight to the response's bytes, "json" uses the standard library. Non-ASCII characters are
+# written as UTF-8 rather than \u escapes.
+
+JSON_PROVIDERS = ["orjson", "json"]
+
+
+# Sets the JSON config of the app from the environment
+def configure_json(app, environ=os.environ):
+    app.config.setdefault('JSON_PROVIDER', environ.get('JSON_PROVIDER', 'orjson' if orjson is not None else 'json'))
+
+
+# Converts what json/orjson can't serialize on their own
+def json_default(o):
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, (bytes, bytearray, memoryview)):
+        return base64.b64encode(o).decode("ascii")
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    default = staticmethod(json_default)
+    ensure_ascii = False
+
+    # Compact UTF-8 JSON, for writing a response body piece by piece (see streaming.py)
+    def dumps_bytes(self, obj):
+        return self.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    def options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        # orjson has no equivalent of most json.dumps arguments
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=json_default, option=self.options()).decode("utf-8")
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=json_default, option=self.options())
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    # Like DefaultJSONProvider.response, without going through a str
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=json_default, option=self.options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# Makes the app use the JSON_PROVIDER implementation
+def init_json(app):
+    provider = app.config.get('JSON_PROVIDER')
+    if provider not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(JSON_PROVIDERS)}, not {provider!r}")
+    if provider == "orjson":
+        if orjson is None:
+            raise ValueError("JSON_PROVIDER is orjson but orjson isn't installed")
+        app.json = OrjsonJSONProvider(app)
+    else:
+        app.json = StdlibJSONProvider(app)
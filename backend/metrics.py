@@ -0,0 +1,73 @@
+import os
+import time
+from flask import request
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from request_timing import track_request_statements, current_request_stats
+
+# Prometheus metrics, served in the text format at /api/metrics. On by default, METRICS=false
+# turns them off.
+# The statement counts and database time come from request_timing.py's event listeners, which
+# then run on every SQL statement, whether or not REQUEST_TIMING is on: about 7 µs per statement
+# (see benchmarks/bench_sqlite_engine.py), so 35 µs for a request running 5 statements.
+# Per Flask endpoint (e.g. "api.get_forum_posts"): requests by method and status, latency,
+# response size, and the number of SQL statements and database time per request (counted by
+# request_timing.py). Also hits and misses of the in-process caches, by cache.
+# Under gunicorn every worker process has its own metrics: with PROMETHEUS_MULTIPROC_DIR set (see
+# gunicorn.conf.py) each writes them to memory-mapped files in that directory, and /api/metrics
+# adds up the files of all workers, whichever worker serves it.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to handle a request", ["endpoint", "method"], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size", ["endpoint"], buckets=SIZE_BUCKETS)
+DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements run by a request", ["endpoint"], buckets=STATEMENT_BUCKETS
+)
+DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time spent running SQL statements in a request", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Lookups in the in-process caches", ["cache", "result"])
+
+
+# Counts a cache lookup, result is "hit" or "miss"
+def record_cache_lookup(cache, result):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+def record_request(response):
+    stats = current_request_stats()
+    if stats is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - stats.start)
+    # streamed responses have no length yet
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+    DB_STATEMENTS.labels(endpoint).observe(stats.statement_count)
+    DB_TIME.labels(endpoint).observe(stats.db_time)
+    return response
+
+# Returns (body, content type) of the metrics of every worker process
+def render_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+# Sets the metrics config of the app from the environment
+def configure_metrics(app, environ=os.environ):
+    app.config.setdefault('METRICS', environ.get('METRICS', 'true').lower() == 'true')
+
+# Records the metrics of every request if METRICS is on, to be called after db.init_app
+def init_metrics(app):
+    if not app.config.get('METRICS'):
+        return
+    track_request_statements(app)
+    app.after_request(record_request)
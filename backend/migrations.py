@@ -0,0 +1,121 @@
+import time
+from sqlalchemy import inspect, text
+from models import db
+from blobstore import migrate_images_to_blob_store, LEGACY_IMAGE_COLUMNS
+from image_variants import backfill_image_variants
+from counters import reconcile_counters
+from search import rebuild_search_index
+from facets import rebuild_facet_counts
+
+# Versioned schema migrations, run on startup (see init_database) or with `flask migrate-db`.
+# The schema version of a database is its SQLite user_version (0 for databases created before
+# migrations existed, and for new ones). migrate_database() runs every migration newer than it,
+# in order, and records the new version after each, so a database that is up to date costs one
+# PRAGMA read.
+# Migrations must be idempotent: a version 0 database may be brand new (create_all already made
+# the latest schema) or as old as the first deployment.
+# To change the schema, update the models and append a migration to MIGRATIONS.
+
+
+def get_schema_version():
+    return db.session.execute(text("PRAGMA user_version")).scalar()
+
+def set_schema_version(version):
+    # PRAGMA doesn't take bound parameters
+    db.session.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+def column_names(table):
+    return {column["name"] for column in inspect(db.engine).get_columns(table)}
+
+# Adds a column with the given SQL definition if the table doesn't have it yet.
+# Returns whether it was added
+def add_column(table, column, definition):
+    if column in column_names(table):
+        return False
+    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    db.session.commit()
+    return True
+
+
+# 1. Tables added since the first deployment (blob, image_variant, item_facet_count, the search
+# tables and the triggers). create_all never changes existing tables
+def create_missing_tables():
+    db.create_all()
+
+# 2. Images stored in the database move to the blob store, and get their variants
+def move_images_to_blob_store():
+    inspector = inspect(db.engine)
+    if any(
+        inspector.has_table(table) and old_column in column_names(table)
+        for table, old_column, new_column in LEGACY_IMAGE_COLUMNS
+    ):
+        migrate_images_to_blob_store()
+    backfill_image_variants()
+
+# 3. Like and comment counters on listings and posts
+def add_counter_columns():
+    added = [
+        add_column("item_listing", "like_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("forum_post", "comment_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("forum_post", "like_count", "INTEGER NOT NULL DEFAULT 0"),
+    ]
+    if any(added):
+        reconcile_counters()
+
+# 4. Optimistic locking version of offers
+def add_offer_version_column():
+    add_column("item_offer", "version", "INTEGER NOT NULL DEFAULT 1")
+
+# 5. Every index declared on the models (create_all only creates the indexes of new tables)
+def create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+# 6. Search and facet count tables may be new (see 1): fill them from the existing rows
+def build_derived_tables():
+    rebuild_search_index()
+    rebuild_facet_counts()
+
+
+# (version, description, migration)
+MIGRATIONS = [
+    (1, "create missing tables", create_missing_tables),
+    (2, "move images into the blob store", move_images_to_blob_store),
+    (3, "add like and comment counters", add_counter_columns),
+    (4, "add offer version", add_offer_version_column),
+    (5, "create missing indexes", create_missing_indexes),
+    (6, "build search index and facet counts", build_derived_tables),
+]
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# Brings the database up to LATEST_SCHEMA_VERSION. Returns the versions applied
+def migrate_database():
+    if db.engine.dialect.name != "sqlite":
+        # the migrations (and the search tables and triggers) are SQLite specific
+        db.create_all()
+        return []
+
+    current_version = get_schema_version()
+    if current_version >= LATEST_SCHEMA_VERSION:
+        return []
+
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        start = time.perf_counter()
+        migration()
+        set_schema_version(version)
+        db.session.commit()
+        applied.append(version)
+        print(f"Migrated database to version {version} ({description}) in {time.perf_counter() - start:.2f}s")
+    return applied
+
+# Drops every table, for a fresh start (see `flask seed --reset`)
+def drop_database():
+    db.drop_all()
+    if db.engine.dialect.name == "sqlite":
+        set_schema_version(0)
+        db.session.commit()
@@ -1,8 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
-import base64
 from datetime import datetime
 
 db = SQLAlchemy()
+
+
+# Images are served by /api/images/<item|post>/<id>/<hash>, so JSON payloads only carry these URLs.
+# The hash of the original image makes the URL change with the image, even when a new listing or
+# post reuses the id of a deleted one
+def item_image_url(item_id, picture_hash):
+    return f"/api/images/item/{item_id}/{picture_hash}"
+
+def post_image_url(post_id, photo_hash):
+    return f"/api/images/post/{post_id}/{photo_hash}"
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), unique=True, nullable=False)
@@ -26,13 +36,25 @@ class User(db.Model):
             "id": self.id,
             "name": self.name,
             "email": self.email,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
             "bio": self.bio,
             "profile_picture_url": self.profile_picture_url,
         }
 
 class ItemListing(db.Model):
     __tablename__ = 'item_listing'
+    # indexes backing keyset pagination of the store feed and profile listings,
+    # and filtering / facet counts on the store feed (see facets.py)
+    __table_args__ = (
+        db.Index('ix_item_listing_available_created', 'is_available', 'created_at', 'id'),
+        db.Index('ix_item_listing_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_category', 'is_available', 'category', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_size', 'is_available', 'size', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_color', 'is_available', 'color', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_gender', 'is_available', 'gender', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_condition', 'is_available', 'condition', 'created_at', 'id'),
+        db.Index('ix_item_listing_available_price_facets', 'is_available', 'price', 'category', 'size', 'color', 'gender', 'condition'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -44,14 +66,16 @@ class ItemListing(db.Model):
     gender = db.Column(db.String(50), nullable=False)
     condition = db.Column(db.String(50), nullable=False)
     category = db.Column(db.String(50), nullable=False)
-    picture_data = db.Column(db.LargeBinary, nullable=False)
+    # the image itself lives in the blob store, see blobstore.py
+    picture_hash = db.Column(db.String(64), db.ForeignKey('blob.hash'), nullable=False)
     is_available = db.Column(db.Boolean, default=True)
+    # number of ItemLikes, maintained on write (see counters.py)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     likes = db.relationship('ItemLike', backref='item', lazy=True)
     offers = db.relationship('ItemOffer', back_populates='item', lazy=True)
 
     def serialize(self):
-        encoded_picture = base64.b64encode(self.picture_data).decode('utf-8')
         return {
             "id": self.id,
             "title": self.title,
@@ -64,19 +88,41 @@ class ItemListing(db.Model):
             "gender": self.gender,
             "condition": self.condition,
             "category": self.category,
-            "picture_data": encoded_picture,
+            "picture_url": item_image_url(self.id, self.picture_hash),
             "is_available": self.is_available,
+            "like_count": self.like_count,
         }
 
+# Number of available item listings for each combination of facet values.
+# Kept up to date by triggers on item_listing (see facets.py), so the store feed can get
+# facet counts from a few thousand rows at most instead of scanning every listing
+class ItemFacetCount(db.Model):
+    __tablename__ = 'item_facet_count'
+    category = db.Column(db.String(50), primary_key=True)
+    size = db.Column(db.String(50), primary_key=True)
+    color = db.Column(db.String(50), primary_key=True)
+    gender = db.Column(db.String(50), primary_key=True)
+    condition = db.Column(db.String(50), primary_key=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+
 class ForumPost(db.Model):
     __tablename__ = 'forum_post'
+    # for paging through the forum feed, optionally filtered by category (see get_forum_posts)
+    __table_args__ = (
+        db.Index('ix_forum_post_created', 'created_at', 'id'),
+        db.Index('ix_forum_post_category_created', 'category', 'created_at', 'id'),
+        db.Index('ix_forum_post_user_created', 'user_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False)
-    photo_data = db.Column(db.LargeBinary, nullable=True)
+    photo_hash = db.Column(db.String(64), db.ForeignKey('blob.hash'), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # number of ForumComments / ForumLikes, maintained on write (see counters.py)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     #explicit definition of relationships
     comments = db.relationship('ForumComment', backref='post', cascade='all, delete-orphan')
@@ -86,10 +132,11 @@ class ForumPost(db.Model):
         string = f"ID: {self.id}, Title: {self.title}, User_ID: {self.user_id}, Content: {self.content}, Created_At: {self.created_at}"
         return string
 
+    # Loads self.author if it isn't loaded yet: query with joinedload(ForumPost.author) to avoid
+    # a query per post
     def serialize(self):
-        encoded_photo = base64.b64encode(self.photo_data).decode('utf-8') if self.photo_data else None  
         author_name = self.author.name if self.author else "Unknown User"
-        
+
         return {
             "id": self.id,
             "title": self.title,
@@ -97,12 +144,18 @@ class ForumPost(db.Model):
             "author_name": author_name,
             "content": self.content,
             "category": self.category, 
-            "photo_data": encoded_photo,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "photo_url": post_image_url(self.id, self.photo_hash) if self.photo_hash else None,
+            "created_at": self.created_at,
+            "comment_count": self.comment_count,
+            "like_count": self.like_count,
         }
 
 class ForumComment(db.Model):
     __tablename__ = 'forum_comment'
+    # for paging through a post's comments (see get_comment_page)
+    __table_args__ = (
+        db.Index('ix_forum_comment_post_created', 'forum_post_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     forum_post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -113,6 +166,8 @@ class ForumComment(db.Model):
         string = f"ID: {self.id}, Forum_Post_ID: {self.forum_post_id}, User_ID: {self.user_id}, Content: {self.content}, Created_At: {self.created_at}"
         return string
 
+    # Loads self.commenter if it isn't loaded yet: query with joinedload(ForumComment.commenter)
+    # to avoid a query per comment
     def serialize(self):
         commenter_name = self.commenter.name if self.commenter else "Unknown User"
 
@@ -122,7 +177,7 @@ class ForumComment(db.Model):
             "user_id": self.user_id,
             "commenter_name": commenter_name,
             "content": self.content,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
         }
 
 class ForumLike(db.Model):
@@ -141,11 +196,16 @@ class ForumLike(db.Model):
             "id": self.id,
             "forum_post_id": self.forum_post_id,
             "user_id": self.user_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
         }
 
 class ItemLike(db.Model):
     __tablename__ = 'item_like'
+    __table_args__ = (
+        db.Index('ix_item_like_user_created', 'user_id', 'created_at', 'id'),
+        # "has this user liked these items" (see enrichment.py) and deleting an item's likes
+        db.Index('ix_item_like_item_user', 'item_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('item_listing.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -160,10 +220,20 @@ class ItemLike(db.Model):
             "id": self.id,
             "item_id": self.item_id,
             "user_id": self.user_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
         }
     
+OFFER_STATUSES = ["Pending", "Accepted", "Declined", "Completed", "Cancelled"]
+
 class ItemOffer(db.Model):
+    # for paging through a user's sent / received offers (see get_offer_page), and any lookup by
+    # buyer_id or seller_id
+    __table_args__ = (
+        db.Index('ix_item_offer_buyer_created', 'buyer_id', 'created_at', 'id'),
+        db.Index('ix_item_offer_seller_created', 'seller_id', 'created_at', 'id'),
+        # an item's offers in a given status, e.g. declining the pending ones (see offer_state.py)
+        db.Index('ix_item_offer_item_status', 'item_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('item_listing.id'), nullable=False)
     buyer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -176,8 +246,14 @@ class ItemOffer(db.Model):
     buyer_completed = db.Column(db.Boolean, default=False)
     seller_completed = db.Column(db.Boolean, default=False)
 
+    # bumped on every change, for optimistic locking (see offer_state.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     item = db.relationship('ItemListing', back_populates='offers')
+    buyer = db.relationship('User', foreign_keys=[buyer_id])
+    seller = db.relationship('User', foreign_keys=[seller_id])
 
     def serialize(self):
         return {
@@ -186,10 +262,46 @@ class ItemOffer(db.Model):
             "buyer_id": self.buyer_id,
             "seller_id": self.seller_id,
             "offer_amount": self.offer_amount,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
             "status": self.status,
             "buyer_completed": self.buyer_completed,
             "seller_completed": self.seller_completed,
+            "version": self.version,
         }
 
 
+
+
+# Resized copies of an item listing or forum post image, see images.VARIANT_SIZES
+class ImageVariant(db.Model):
+    __tablename__ = 'image_variant'
+    __table_args__ = (
+        db.UniqueConstraint('owner_type', 'owner_id', 'size', name='uq_image_variant_owner_size'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    owner_type = db.Column(db.String(20), nullable=False)  # "item" or "post"
+    owner_id = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.String(20), nullable=False)  # "thumb", "card" or "full"
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    blob_hash = db.Column(db.String(64), db.ForeignKey('blob.hash'), nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self) -> str:
+        string = f"ID: {self.id}, Owner: {self.owner_type} {self.owner_id}, Size: {self.size}, Dimensions: {self.width}x{self.height}"
+        return string
+
+
+# An image stored on disk by the blob store, keyed by the SHA-256 of its bytes
+class Blob(db.Model):
+    __tablename__ = 'blob'
+    hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(50), nullable=False)
+    # number of rows (item listings, forum posts, image variants) using this blob
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self) -> str:
+        string = f"Hash: {self.hash}, Size: {self.size}, Content_Type: {self.content_type}, Refcount: {self.refcount}"
+        return string
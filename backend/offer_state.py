@@ -0,0 +1,156 @@
+from sqlalchemy import case, delete, select, update
+from models import db, ItemListing, ItemOffer
+
+# Offer state machine.
+#
+#   Pending --accept--> Accepted --complete (buyer and seller)--> Completed
+#   Pending --decline--> Declined         Accepted --cancel--> Cancelled
+#   Pending --withdraw--> (deleted)
+#
+# Every transition is one conditional UPDATE (or DELETE) ... WHERE status IN (<allowed statuses>),
+# so two requests racing on the same offer can't both succeed: the second one matches no row.
+# Each change also bumps ItemOffer.version. Clients that send the version they last saw get a
+# StaleOffer error if the offer has changed since (optimistic locking).
+# Only when a transition fails is the offer read, to report why. Callers commit.
+
+
+class OfferError(Exception):
+    status_code = 400
+
+class OfferNotFound(OfferError):
+    status_code = 403
+
+class InvalidTransition(OfferError):
+    status_code = 400
+
+class StaleOffer(OfferError):
+    status_code = 409
+
+
+ROLE_COLUMNS = {
+    "buyer": ItemOffer.buyer_id,
+    "seller": ItemOffer.seller_id,
+}
+COMPLETED_COLUMNS = {
+    "buyer": (ItemOffer.buyer_completed, ItemOffer.seller_completed),
+    "seller": (ItemOffer.seller_completed, ItemOffer.buyer_completed),
+}
+
+# columns returned by every transition
+RETURNED_COLUMNS = (
+    ItemOffer.id, ItemOffer.item_id, ItemOffer.buyer_id, ItemOffer.seller_id, ItemOffer.status,
+    ItemOffer.buyer_completed, ItemOffer.seller_completed, ItemOffer.version,
+)
+
+
+def offer_conditions(offer_id, user_id, roles, from_statuses, version):
+    conditions = [
+        ItemOffer.id == offer_id,
+        db.or_(*(ROLE_COLUMNS[role] == user_id for role in roles)),
+        ItemOffer.status.in_(from_statuses),
+    ]
+    if version is not None:
+        conditions.append(ItemOffer.version == version)
+    return conditions
+
+# Called after a transition matched no row: reads the offer to raise the right error
+def explain_failure(offer_id, user_id, roles, from_statuses, version, not_found_message, invalid_message):
+    offer = db.session.execute(
+        select(ItemOffer.buyer_id, ItemOffer.seller_id, ItemOffer.status, ItemOffer.version)
+        .where(ItemOffer.id == offer_id)
+    ).first()
+    if offer is None or user_id not in [offer.buyer_id if role == "buyer" else offer.seller_id for role in roles]:
+        raise OfferNotFound(not_found_message)
+    if version is not None and offer.version != version:
+        raise StaleOffer("Offer has been changed by someone else, reload and try again")
+    raise InvalidTransition(invalid_message)
+
+# Applies `values` to the offer if `user_id` is its buyer or seller (one of `roles`) and its status
+# is one of `from_statuses`. Returns the updated offer row
+def transition(offer_id, user_id, roles, from_statuses, values, version=None, extra_conditions=(),
+               not_found_message="Offer not found", invalid_message="Offer can't be changed in its current status"):
+    conditions = offer_conditions(offer_id, user_id, roles, from_statuses, version)
+    row = db.session.execute(
+        update(ItemOffer)
+        .where(*conditions, *extra_conditions)
+        .values(**values, version=ItemOffer.version + 1)
+        .returning(*RETURNED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        explain_failure(offer_id, user_id, roles, from_statuses, version, not_found_message, invalid_message)
+    return row
+
+
+def accept_offer(offer_id, seller_id, version=None):
+    return transition(
+        offer_id, seller_id, ["seller"], ["Pending"], {"status": "Accepted"}, version,
+        not_found_message="Offer not found or you do not have permission to accept this offer",
+        invalid_message="Offer has already been accepted or declined",
+    )
+
+def decline_offer(offer_id, seller_id, version=None):
+    return transition(
+        offer_id, seller_id, ["seller"], ["Pending"], {"status": "Declined"}, version,
+        not_found_message="Offer not found or you do not have permission to decline this offer",
+        invalid_message="Offer has already been accepted or declined",
+    )
+
+# Buyer or seller backs out of an accepted offer
+def cancel_offer(offer_id, user_id, version=None):
+    return transition(
+        offer_id, user_id, ["buyer", "seller"], ["Accepted"],
+        {"status": "Cancelled", "buyer_completed": False, "seller_completed": False}, version,
+        not_found_message="You do not have permission to cancel this offer",
+        invalid_message="Only accepted offers can be cancelled",
+    )
+
+# Buyer takes back a pending offer
+def withdraw_offer(offer_id, buyer_id, version=None):
+    conditions = offer_conditions(offer_id, buyer_id, ["buyer"], ["Pending"], version)
+    deleted = db.session.execute(
+        delete(ItemOffer).where(*conditions).execution_options(synchronize_session=False)
+    ).rowcount
+    if not deleted:
+        explain_failure(
+            offer_id, buyer_id, ["buyer"], ["Pending"], version,
+            "Offer not found or you do not have permission to decline this offer",
+            "Offer has already been accepted or declined",
+        )
+
+# Buyer or seller (role) confirms an accepted offer. Once both have, the offer is Completed and
+# the item is no longer available. The other pending offers on the item are declined.
+# Setting this side's flag and checking the other side's happen in the same UPDATE, so the two
+# sides completing at the same time can't miss each other.
+def complete_offer(offer_id, user_id, role, version=None):
+    own_completed, other_completed = COMPLETED_COLUMNS[role]
+    row = transition(
+        offer_id, user_id, [role], ["Accepted"],
+        {
+            own_completed.key: True,
+            "status": case((other_completed.is_(True), "Completed"), else_=ItemOffer.status),
+        },
+        version,
+        extra_conditions=[own_completed.isnot(True)],
+        not_found_message=f"Offer not found or you are not the {role}",
+        invalid_message=f"{role.capitalize()} already marked as complete or offer is not accepted",
+    )
+
+    if row.status == "Completed":
+        db.session.execute(
+            update(ItemListing)
+            .where(ItemListing.id == row.item_id)
+            .values(is_available=False)
+            .execution_options(synchronize_session=False)
+        )
+    decline_pending_offers(row.item_id)
+    return row
+
+# Declines every pending offer on an item in one statement
+def decline_pending_offers(item_id):
+    return db.session.execute(
+        update(ItemOffer)
+        .where(ItemOffer.item_id == item_id, ItemOffer.status == "Pending")
+        .values(status="Declined", version=ItemOffer.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
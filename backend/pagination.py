@@ -0,0 +1,64 @@
+import base64
+from flask import request
+from sqlalchemy import and_, or_, type_coerce
+from models import db
+
+DEFAULT_PAGE_LIMIT = 24
+MAX_PAGE_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Cursors are an opaque, url-safe encoding of the sort key of the last row on a page,
+# by default its (created_at, id)
+def encode_cursor(*values):
+    raw = "|".join(str(value) for value in values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor_values(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = decode_cursor_values(cursor)
+        return created_at, int(row_id)
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+# Reads ?limit= and ?cursor= from the current request
+def get_page_args(decode=decode_cursor, max_limit=MAX_PAGE_LIMIT):
+    limit = request.args.get("limit", DEFAULT_PAGE_LIMIT, type=int)
+    limit = max(1, min(limit, max_limit))
+    cursor = request.args.get("cursor")
+    return limit, decode(cursor) if cursor else None
+
+# Keyset pagination on (created_at, id) descending.
+# Instead of OFFSET, each page starts right after the last row of the previous one,
+# so fetching a deep page costs the same as fetching the first one.
+# Returns the rows of the page and the cursor of the next page (None on the last page).
+def paginate(query, created_col, id_col, limit, cursor):
+    # Compare created_at as the raw stored text so that the cursor round-trips exactly
+    raw_created = type_coerce(created_col, db.String)
+    rows = page_query(query.add_columns(raw_created, id_col), created_col, id_col, limit, cursor).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return [row[0] for row in rows], next_cursor
+
+# The query for a page (plus one row, to know if there's a next one), in the order of paginate
+def page_query(query, created_col, id_col, limit, cursor):
+    raw_created = type_coerce(created_col, db.String)
+    if cursor:
+        cursor_created, cursor_id = cursor
+        query = query.filter(or_(
+            raw_created < cursor_created,
+            and_(raw_created == cursor_created, id_col < cursor_id),
+        ))
+    return query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
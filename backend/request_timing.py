@@ -0,0 +1,113 @@
+import os
+import time
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from models import db
+
+# Per-request database instrumentation, turned on with REQUEST_TIMING=true.
+# Every SQL statement a request runs is timed (SQLAlchemy's before/after_cursor_execute events),
+# and the response gets a Server-Timing header with the statement count, the total database time,
+# the slowest statement and the whole request's time, which browser dev tools show under Timing:
+#   Server-Timing: db;dur=12.31;desc="7 statements", db-slowest;dur=4.02, total;dur=20.57
+# Requests slower than SLOW_REQUEST_MS (0 turns this off) are logged with their statements.
+# When turned off, none of the event listeners or request hooks are registered (unless metrics.py
+# needs the statement counts).
+
+DEFAULT_SLOW_REQUEST_MS = 500
+# at most this many statements of a request are kept for the slow request log
+MAX_LOGGED_STATEMENTS = 50
+MAX_LOGGED_STATEMENT_LENGTH = 300
+
+
+# Sets the request timing config of the app from the environment
+def configure_request_timing(app, environ=os.environ):
+    app.config.setdefault('REQUEST_TIMING', environ.get('REQUEST_TIMING', '').lower() == 'true')
+    app.config.setdefault('SLOW_REQUEST_MS', float(environ.get('SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)))
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statement_count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        # [(duration, statement)] in the order they ran
+        self.statements = []
+
+    def add_statement(self, statement, duration):
+        self.statement_count += 1
+        self.db_time += duration
+        self.slowest_time = max(self.slowest_time, duration)
+        if len(self.statements) < MAX_LOGGED_STATEMENTS:
+            self.statements.append((duration, statement))
+
+    def server_timing(self, total_time):
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.statement_count} statements", '
+            f'db-slowest;dur={self.slowest_time * 1000:.2f}, '
+            f'total;dur={total_time * 1000:.2f}'
+        )
+
+# The stats of the current request, or None outside a request (e.g. CLI commands)
+def current_request_stats():
+    return g.get('request_stats') if has_app_context() else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['statement_start'].pop()
+    stats = current_request_stats()
+    if stats is not None:
+        stats.add_statement(statement, duration)
+
+# after_cursor_execute doesn't run for a failed statement
+def handle_error(exception_context):
+    if exception_context.connection is not None:
+        starts = exception_context.connection.info.get('statement_start')
+        if starts:
+            starts.pop()
+
+def start_request_stats():
+    g.request_stats = RequestStats()
+
+def finish_request_stats(response, slow_request_ms, logger):
+    stats = current_request_stats()
+    if stats is None:
+        return response
+    total_time = time.perf_counter() - stats.start
+    response.headers['Server-Timing'] = stats.server_timing(total_time)
+
+    if slow_request_ms and total_time * 1000 >= slow_request_ms:
+        lines = [
+            f"Slow request: {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+            f"in {total_time * 1000:.1f} ms, {stats.statement_count} statements in {stats.db_time * 1000:.1f} ms"
+        ]
+        for duration, statement in stats.statements:
+            lines.append(f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())[:MAX_LOGGED_STATEMENT_LENGTH]}")
+        if stats.statement_count > len(stats.statements):
+            lines.append(f"  ... {stats.statement_count - len(stats.statements)} more")
+        logger.warning("\n".join(lines))
+    return response
+
+# Starts timing the statements of every request (stored in g.request_stats), once per app.
+# To be called after db.init_app
+def track_request_statements(app):
+    if app.extensions.get('request_stats'):
+        return
+    app.extensions['request_stats'] = True
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after_cursor_execute)
+            event.listen(engine, "handle_error", handle_error)
+    app.before_request(start_request_stats)
+
+# Adds the Server-Timing header and the slow request log if REQUEST_TIMING is on, to be called after db.init_app
+def init_request_timing(app):
+    if not app.config.get('REQUEST_TIMING'):
+        return
+    track_request_statements(app)
+    slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+    app.after_request(lambda response: finish_request_stats(response, slow_request_ms, app.logger))
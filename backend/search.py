@@ -0,0 +1,148 @@
+import re
+from sqlalchemy import DDL, event, text
+from models import db, item_image_url, post_image_url
+from pagination import encode_cursor, decode_cursor_values, InvalidCursor
+
+# Full-text search over item listings (title, description) and forum posts (title, content),
+# using SQLite FTS5 tables that index the text of the real tables ("external content" tables,
+# so the text isn't stored twice). Triggers keep them in sync on every insert, update and delete.
+
+# (fts table, source table, indexed columns)
+SEARCH_TABLES = [
+    ("item_listing_fts", "item_listing", ["title", "description"]),
+    ("forum_post_fts", "forum_post", ["title", "content"]),
+]
+
+# Matches in titles count for more than matches in descriptions / post content
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+
+def search_table_ddl(fts_table, source_table, columns):
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    old_values = ", ".join(f"OLD.{column}" for column in columns)
+    return [
+        # prefix='2 3' also indexes 2 and 3 letter prefixes, so prefix queries ("vint*") stay fast
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content='{source_table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {source_table}
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {source_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {source_table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END
+        """,
+    ]
+
+# create the search tables along with the other tables, and drop them with them
+for fts_table, source_table, columns in SEARCH_TABLES:
+    for statement in search_table_ddl(fts_table, source_table, columns):
+        event.listen(db.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(db.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {fts_table}").execute_if(dialect="sqlite"))
+
+# Re-indexes everything from the source tables, e.g. for a database created before search existed
+def rebuild_search_index():
+    for fts_table, source_table, columns in SEARCH_TABLES:
+        for statement in search_table_ddl(fts_table, source_table, columns):
+            db.session.execute(text(statement))
+        db.session.execute(text(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+# Turns what the user typed into an FTS5 query: every word must match, as a prefix
+# ("vint den" finds "vintage denim"). Words are quoted so FTS5 syntax in the input is never parsed
+def build_match_query(user_query):
+    words = re.findall(r"\w+", user_query)
+    return " ".join(f'"{word}"*' for word in words)
+
+def decode_search_cursor(cursor):
+    try:
+        score, result_type, result_id = decode_cursor_values(cursor)
+        return float(score), result_type, int(result_id)
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+SEARCH_QUERY = f"""
+SELECT * FROM (
+    SELECT 'item' AS type, item_listing.id, item_listing.title, item_listing.price,
+           item_listing.category, item_listing.created_at, item_listing.user_id,
+           NULL AS author_name, item_listing.picture_hash AS image_hash,
+           bm25(item_listing_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+    FROM item_listing_fts JOIN item_listing ON item_listing.id = item_listing_fts.rowid
+    WHERE item_listing_fts MATCH :match AND item_listing.is_available AND :include_items
+    UNION ALL
+    SELECT 'post', forum_post.id, forum_post.title, NULL,
+           forum_post.category, forum_post.created_at, forum_post.user_id,
+           user.name, forum_post.photo_hash,
+           bm25(forum_post_fts, {TITLE_WEIGHT}, {BODY_WEIGHT})
+    FROM forum_post_fts JOIN forum_post ON forum_post.id = forum_post_fts.rowid
+    LEFT JOIN user ON user.id = forum_post.user_id
+    WHERE forum_post_fts MATCH :match AND :include_posts
+)
+WHERE :no_cursor OR (score, type, id) > (:cursor_score, :cursor_type, :cursor_id)
+ORDER BY score, type, id
+LIMIT :limit
+"""
+
+# Searches available item listings and/or forum posts, best matches first (lowest BM25 score).
+# Only the columns needed for a result are read, never the full rows.
+# Returns a page of results and the cursor of the next page (None on the last page)
+def search(user_query, limit, cursor=None, include_items=True, include_posts=True):
+    match = build_match_query(user_query)
+    if not match:
+        return [], None
+
+    cursor_score, cursor_type, cursor_id = cursor or (0.0, "", 0)
+    # created_at comes back as a datetime, as from the models, for the JSON provider to format
+    query = text(SEARCH_QUERY).columns(created_at=db.DateTime)
+    rows = db.session.execute(query, {
+        "match": match,
+        "include_items": include_items,
+        "include_posts": include_posts,
+        "no_cursor": cursor is None,
+        "cursor_score": cursor_score,
+        "cursor_type": cursor_type,
+        "cursor_id": cursor_id,
+        "limit": limit + 1,
+    }).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(repr(rows[-1].score), rows[-1].type, rows[-1].id)
+    return [serialize_result(row) for row in rows], next_cursor
+
+def serialize_result(row):
+    result = {
+        "type": row.type,
+        "id": row.id,
+        "title": row.title,
+        "category": row.category,
+        "user_id": row.user_id,
+        "created_at": row.created_at,
+        "score": row.score,
+    }
+    if row.type == "item":
+        result["price"] = row.price
+        result["picture_url"] = item_image_url(row.id, row.image_hash)
+    else:
+        result["author_name"] = row.author_name or "Unknown User"
+        result["photo_url"] = post_image_url(row.id, row.image_hash) if row.image_hash else None
+    return result
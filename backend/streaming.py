@@ -0,0 +1,66 @@
+from itertools import islice
+from flask import current_app, stream_with_context
+from sqlalchemy import type_coerce
+from models import db
+from pagination import encode_cursor, page_query
+
+# Streamed JSON responses for the big list endpoints.
+# stream_page sends a page in the same format as paginate + jsonify:
+#   {"items": [...], "next_cursor": "..."} (plus any extra keys)
+# but without ever holding the whole page: rows come from the database STREAM_BATCH_SIZE at a time
+# (yield_per), and each batch is serialized, enriched (e.g. attach_like_data) and written to the
+# response before the next one is read. Memory per request is one batch, whatever the page size, so
+# these endpoints accept pages of up to MAX_STREAM_PAGE_LIMIT rows.
+# Pages that fit in one batch are sent as a regular response. For bigger ones, the first batch is
+# read before the response starts, so a failing query still gets an error status, but SQL
+# statements run for the next batches happen after the after_request hooks, so they are not in
+# Server-Timing or the metrics.
+
+STREAM_BATCH_SIZE = 50
+MAX_STREAM_PAGE_LIMIT = 1000
+
+
+# Returns a response streaming one page of query, in the order of paginate.
+# serialize_batch(rows) turns a list of rows into a list of JSON-serializable items
+def stream_page(query, created_col, id_col, limit, cursor, serialize_batch, extra=None):
+    # same cursor columns as paginate
+    raw_created = type_coerce(created_col, db.String)
+    page = page_query(query.add_columns(raw_created, id_col), created_col, id_col, limit, cursor)
+    # a page that fits in one batch (the default page size does) is read and sent in one go
+    if limit < STREAM_BATCH_SIZE:
+        body = generate_page(page.all(), iter(()), limit, serialize_batch, extra or {}, current_app.json)
+        return current_app.response_class(b"".join(body), mimetype="application/json")
+
+    rows = iter(page.yield_per(STREAM_BATCH_SIZE))
+    first_batch = list(islice(rows, STREAM_BATCH_SIZE))
+    body = generate_page(first_batch, rows, limit, serialize_batch, extra or {}, current_app.json)
+    return current_app.response_class(stream_with_context(body), mimetype="application/json")
+
+def generate_page(first_batch, rows, limit, serialize_batch, extra, json):
+    yield b'{"items":['
+    sent = 0
+    last_row = None
+    has_next_page = False
+    batch = first_batch
+    while batch:
+        # the page query reads one row more than the page, to know if there's a next one
+        if sent + len(batch) > limit:
+            batch = batch[:limit - sent]
+            has_next_page = True
+        if batch:
+            items = serialize_batch([row[0] for row in batch])
+            # the items of the batch, without the brackets of the list
+            chunk = json.dumps_bytes(items)[1:-1]
+            yield b"," + chunk if sent else chunk
+            sent += len(batch)
+            last_row = batch[-1]
+        if has_next_page:
+            break
+        batch = list(islice(rows, STREAM_BATCH_SIZE))
+    # only the extra row can be left, reading to the end closes the cursor
+    for _ in rows:
+        pass
+
+    next_cursor = encode_cursor(last_row[-2], last_row[-1]) if has_next_page else None
+    # the keys after "items", as an object without its opening brace
+    yield b"]," + json.dumps_bytes({"next_cursor": next_cursor, **extra})[1:] + b"\n"
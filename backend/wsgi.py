@@ -0,0 +1,16 @@
+# Production entry point, served by gunicorn (settings in gunicorn.conf.py):
+#   gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app, init_database
+from models import db
+
+app = create_app()
+
+# upgrade the schema if needed (and seed an empty database if SEED_MOCK_DATA=true), never drops data
+# Without preload_app the gunicorn master has already done it (see gunicorn.conf.py), so each worker
+# only reads the schema version here
+init_database(app)
+
+with app.app_context():
+    # with preload_app the workers are forked from this process: don't hand them its connections
+    for engine in db.engines.values():
+        engine.dispose()
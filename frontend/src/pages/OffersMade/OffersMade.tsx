@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react";
 import { OfferMade } from "@/types/OfferMade";
+import { Page } from "@/types/Page";
 import { Tabs, TabsList, TabsTrigger, TabsContent } from "@/components/ui/tabs";
 import { useAuth } from "@/context/UserContext";
 import OfferMadeCard from "@/pages/OffersMade/OfferMadeCard";
@@ -8,28 +9,36 @@ type Tab = "Pending" | "Accepted" | "Declined" | "Completed" | "Cancelled";
 
 export default function OffersMade() {
 	const [offers, setOffers] = useState<OfferMade[]>([]);
+	const [nextCursor, setNextCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [tab, setTab] = useState<Tab>("Pending");
 
 	const userAuth = useAuth();
 	const userId = userAuth.user?.id;
 
+	// Fetch a page of the offers in the current tab, appending it after the current ones
+	const fetchOffers = async (cursor: string | null) => {
+		try {
+			const params = new URLSearchParams({ status: tab });
+			if (cursor) {
+				params.set("cursor", cursor);
+			}
+			const res = await fetch(`/api/user/${userId}/offers-made?${params.toString()}`);
+			if (!res.ok) throw new Error(res.statusText);
+			const data: Page<OfferMade> = await res.json();
+			setOffers((prev) => (cursor ? [...prev, ...data.items] : data.items));
+			setNextCursor(data.next_cursor);
+		} catch (err) {
+			console.error(err);
+		} finally {
+			setLoading(false);
+		}
+	};
+
 	useEffect(() => {
 		if (!userId) return;
-		(async () => {
-			try {
-				const res = await fetch(`/api/user/${userId}/offers-made`);
-				if (!res.ok) throw new Error(res.statusText);
-				const data: OfferMade[] = await res.json();
-				setOffers(data);
-				console.log(data);
-			} catch (err) {
-				console.error(err);
-			} finally {
-				setLoading(false);
-			}
-		})();
-	}, [userId]);
+		fetchOffers(null);
+	}, [userId, tab]);
 
 	if (loading) {
 		return (
@@ -173,6 +182,17 @@ export default function OffersMade() {
 						)}
 					</TabsContent>
 				</Tabs>
+
+				{nextCursor && (
+					<div className="flex justify-center my-8">
+						<button
+							className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+							onClick={() => fetchOffers(nextCursor)}
+						>
+							Load More
+						</button>
+					</div>
+				)}
 			</div>
 		</div>
 	);
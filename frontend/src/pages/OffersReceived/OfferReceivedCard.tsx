@@ -138,7 +138,7 @@ export default function OfferReceivedCard({
 				<div className="flex items-center space-x-4">
 					<Link to={`/item/${offer.item_id}`}>
 						<img
-							src={`data:image/jpeg;base64,${offer.item_picture_data}`}
+							src={`${offer.item_picture_url}?size=thumb`}
 							alt={offer.item_title}
 							className="w-32 h-32 object-cover rounded"
 						/>
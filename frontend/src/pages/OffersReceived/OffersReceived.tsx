@@ -1,6 +1,7 @@
 // src/pages/OffersReceived.tsx
 import { useEffect, useState } from "react";
 import { OfferReceived } from "@/types/OfferReceived";
+import { Page } from "@/types/Page";
 import { Tabs, TabsList, TabsTrigger, TabsContent } from "@/components/ui/tabs";
 import { useAuth } from "@/context/UserContext";
 
@@ -10,27 +11,36 @@ type Tab = "Pending" | "Accepted" | "Declined" | "Completed" | "Cancelled";
 
 export default function OffersReceived() {
 	const [offers, setOffers] = useState<OfferReceived[]>([]);
+	const [nextCursor, setNextCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [tab, setTab] = useState<Tab>("Pending");
 
 	const userAuth = useAuth();
 	const userId = userAuth.user?.id;
 
+	// Fetch a page of the offers in the current tab, appending it after the current ones
+	const fetchOffers = async (cursor: string | null) => {
+		try {
+			const params = new URLSearchParams({ status: tab });
+			if (cursor) {
+				params.set("cursor", cursor);
+			}
+			const res = await fetch(`/api/user/${userId}/offers-received?${params.toString()}`);
+			if (!res.ok) throw new Error(res.statusText);
+			const data: Page<OfferReceived> = await res.json();
+			setOffers((prev) => (cursor ? [...prev, ...data.items] : data.items));
+			setNextCursor(data.next_cursor);
+		} catch (err) {
+			console.error(err);
+		} finally {
+			setLoading(false);
+		}
+	};
+
 	useEffect(() => {
 		if (!userId) return;
-		(async () => {
-			try {
-				const res = await fetch(`/api/user/${userId}/offers-received`);
-				if (!res.ok) throw new Error(res.statusText);
-				const data: OfferReceived[] = await res.json();
-				setOffers(data);
-			} catch (err) {
-				console.error(err);
-			} finally {
-				setLoading(false);
-			}
-		})();
-	}, [userId]);
+		fetchOffers(null);
+	}, [userId, tab]);
 
 	if (loading) {
 		return (
@@ -174,6 +184,17 @@ export default function OffersReceived() {
 						)}
 					</TabsContent>
 				</Tabs>
+
+				{nextCursor && (
+					<div className="flex justify-center my-8">
+						<button
+							className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+							onClick={() => fetchOffers(nextCursor)}
+						>
+							Load More
+						</button>
+					</div>
+				)}
 			</div>
 		</div>
 	);
@@ -19,9 +19,12 @@ export interface ForumPost {
   author_name: string; 
   content: string;
   category: CategoryType;
-  photo_data: string | null; 
+  photo_url: string | null;
   created_at: string; 
+  comment_count: number;
+  like_count: number;
   comments?: ForumComment[];
+  comments_next_cursor?: string | null;
 }
 
 export interface ForumComment {
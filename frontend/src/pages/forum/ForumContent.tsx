@@ -9,11 +9,13 @@ import {
 	defaultColors,
 	ForumPost,
 } from "./ForumConstants";
+import { Page } from "@/types/Page";
 import NewPostForm from "./NewForumPostForm";
 import { formatDistanceToNow } from "date-fns";
 
 export default function ForumContent() {
 	const [posts, setPosts] = useState<ForumPost[]>([]);
+	const [nextCursor, setNextCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState<string | null>(null);
 	const [selectedCategories, setSelectedCategories] = useState<CategoryType[]>(
@@ -24,19 +26,22 @@ export default function ForumContent() {
 	const [isCollapsed, setIsCollapsed] = useState(false);
 	const [showNewPostForm, setShowNewPostForm] = useState(false);
 
-	const fetchPosts = async () => {
+	// Fetch a page of posts (most recent first) in the selected categories,
+	// appending it after the current ones
+	const fetchPosts = async (cursor: string | null = null) => {
 		try {
 			setLoading(true);
 			setError(null);
-			const res = await fetch("/api/forum/posts", { credentials: "include" });
+			const params = new URLSearchParams();
+			selectedCategories.forEach((category) => params.append("category", category));
+			if (cursor) {
+				params.set("cursor", cursor);
+			}
+			const res = await fetch(`/api/forum/posts?${params.toString()}`, { credentials: "include" });
 			if (!res.ok) throw new Error(`HTTP ${res.status}`);
-			const data: ForumPost[] = await res.json();
-			setPosts(
-				data.sort(
-					(a, b) =>
-						new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-				)
-			);
+			const data: Page<ForumPost> = await res.json();
+			setPosts((prev) => (cursor ? [...prev, ...data.items] : data.items));
+			setNextCursor(data.next_cursor);
 		} catch (err: any) {
 			setError(err.message);
 		} finally {
@@ -44,21 +49,19 @@ export default function ForumContent() {
 		}
 	};
 
+	// Categories are filtered by the backend
 	useEffect(() => {
 		fetchPosts();
-	}, []);
+	}, [selectedCategories]);
 
 	const displayedPosts = posts.filter((p) => {
-		const okCat =
-			selectedCategories.length === 0 ||
-			selectedCategories.includes(p.category);
 		const term = searchTerm.toLowerCase().trim();
-		const okSearch =
+		return (
 			term === "" ||
 			p.title.toLowerCase().includes(term) ||
 			p.content.toLowerCase().includes(term) ||
-			p.author_name.toLowerCase().includes(term);
-		return okCat && okSearch;
+			p.author_name.toLowerCase().includes(term)
+		);
 	});
 
 	return (
@@ -96,7 +99,7 @@ export default function ForumContent() {
 						onCancel={() => setShowNewPostForm(false)}
 					/>
 				)}
-				{loading && <p>Loading posts…</p>}
+				{loading && posts.length === 0 && <p>Loading posts…</p>}
 				{error && <p className="text-red-500">Error: {error}</p>}
 				{!loading && !error && displayedPosts.length === 0 && (
 					<p>No posts yet—be the first to create one!</p>
@@ -132,6 +135,17 @@ export default function ForumContent() {
 						})}
 					</div>
 				)}
+
+				{nextCursor && !loading && (
+					<div className="flex justify-center my-8">
+						<button
+							className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+							onClick={() => fetchPosts(nextCursor)}
+						>
+							Load More
+						</button>
+					</div>
+				)}
 			</div>
 		</div>
 	);
@@ -8,6 +8,7 @@ import {
 	ForumPost,
 	ForumComment,
 } from "./ForumConstants";
+import { Page } from "@/types/Page";
 import { useAuth } from "@/context/UserContext";
 import { Trash } from "lucide-react";
 import Linkify from 'linkify-react';
@@ -20,6 +21,7 @@ export default function ForumPostPage() {
 	const [error, setError] = useState<string | null>(null);
 
 	const [comments, setComments] = useState<ForumComment[]>([]);
+	const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
 	const [newCommentContent, setNewCommentContent] = useState("");
 
 	const [isOwner, setIsOwner] = useState(false);
@@ -99,6 +101,7 @@ export default function ForumPostPage() {
 				const data: ForumPost = await response.json();
 				setPost(data);
 				setComments(data.comments || []);
+				setCommentsCursor(data.comments_next_cursor || null);
 
 				/////////
 			} catch (err: any) {
@@ -120,6 +123,19 @@ export default function ForumPostPage() {
 		}
 	}, [post, userId]);
 
+	// Fetch the next page of (older) comments
+	const fetchMoreComments = async () => {
+		if (!postId || !commentsCursor) return;
+		const res = await fetch(`/api/forum/posts/${postId}/comments?cursor=${commentsCursor}`);
+		if (!res.ok) {
+			console.error("Could not load comments");
+			return;
+		}
+		const data: Page<ForumComment> = await res.json();
+		setComments((prev) => [...prev, ...data.items]);
+		setCommentsCursor(data.next_cursor);
+	};
+
 	const handleAddComment = async () => {
 		if (!newCommentContent.trim() || !post) return;
 
@@ -197,10 +213,10 @@ export default function ForumPostPage() {
 				</div>
 
 
-				{post.photo_data && (
+				{post.photo_url && (
 					<div className="mb-4 hover:ring-2 dark:hover:ring-gray-700 transition-all duration-300 ease-in-out">
 						<img
-							src={`data:image/jpeg;base64,${post.photo_data}`}
+							src={`${post.photo_url}?size=full`}
 							alt="Post photo"
 							className="max-w-full h-auto rounded shadow"
 						/>
@@ -283,6 +299,17 @@ export default function ForumPostPage() {
 						</div>
 					))}
 				</div>
+
+				{commentsCursor && (
+					<div className="flex justify-center my-6">
+						<button
+							className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+							onClick={fetchMoreComments}
+						>
+							Load More Comments
+						</button>
+					</div>
+				)}
 			</section>
 		</div>
 	);
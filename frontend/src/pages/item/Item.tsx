@@ -170,7 +170,7 @@ export default function Item() {
 		return true;
 	};
 
-	const imageDataUrl = `data:image/jpeg;base64,${storeItem?.picture_data}`;
+	const imageUrl = `${storeItem?.picture_url}?size=full`;
 
 	if (loading) {
 		return (
@@ -202,7 +202,7 @@ export default function Item() {
 						{/* Left: Item Image */}
 						<div className="w-1/2">
 							<img
-								src={imageDataUrl}
+								src={imageUrl}
 								alt={storeItem.title}
 								className="w-full h-full object-cover"
 							/>
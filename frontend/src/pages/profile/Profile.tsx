@@ -1,5 +1,6 @@
 import { useParams } from "react-router-dom";
 import { StoreItem } from "@/types/StoreItem";
+import { Page } from "@/types/Page";
 import { User } from "@/types/User";
 import { useEffect, useState } from "react";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
@@ -65,6 +66,8 @@ export default function Profile() {
 	const [profileUser, setProfileUser] = useState<User | null>(null);
 	const [profileStoreItems, setProfileStoreItems] = useState<StoreItem[]>([]);
 	const [profileLikedItems, setProfileLikedItems] = useState<StoreItem[]>([]);
+	const [storeItemsCursor, setStoreItemsCursor] = useState<string | null>(null);
+	const [likedItemsCursor, setLikedItemsCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [isOwner, setIsOwner] = useState(false);
 	const [isDialogOpen, setIsDialogOpen] = useState(false);
@@ -75,6 +78,52 @@ export default function Profile() {
 
 	const userAuth = useAuth();
 
+	// Fetch a page of the user's store items, appending it after the current ones
+	const fetchProfileStoreItems = async (cursor: string | null) => {
+		try {
+			const params = new URLSearchParams();
+			if (cursor) {
+				params.set("cursor", cursor);
+			}
+			const response = await fetch(
+				`/api/user/${userId}/store-items?${params.toString()}`
+			);
+			if (!response.ok) {
+				throw new Error(response.statusText);
+			}
+			const data: Page<StoreItem> = await response.json();
+			setProfileStoreItems((prev) =>
+				cursor ? [...prev, ...data.items] : data.items
+			);
+			setStoreItemsCursor(data.next_cursor);
+		} catch (error) {
+			console.error("Error fetching store items:", error);
+		}
+	};
+
+	// Fetch a page of the items the user liked, appending it after the current ones
+	const fetchProfileLikedItems = async (cursor: string | null) => {
+		try {
+			const params = new URLSearchParams();
+			if (cursor) {
+				params.set("cursor", cursor);
+			}
+			const response = await fetch(
+				`/api/user/${userId}/liked-items?${params.toString()}`
+			);
+			if (!response.ok) {
+				throw new Error(response.statusText);
+			}
+			const data: Page<StoreItem> = await response.json();
+			setProfileLikedItems((prev) =>
+				cursor ? [...prev, ...data.items] : data.items
+			);
+			setLikedItemsCursor(data.next_cursor);
+		} catch (error) {
+			console.error("Error fetching liked items:", error);
+		}
+	};
+
 	useEffect(() => {
 		const fetchProfileUser = async () => {
 			try {
@@ -89,32 +138,6 @@ export default function Profile() {
 			}
 		};
 
-		const fetchProfileStoreItems = async () => {
-			try {
-				const response = await fetch(`/api/user/${userId}/store-items`);
-				if (!response.ok) {
-					throw new Error(response.statusText);
-				}
-				const data: StoreItem[] = await response.json();
-				setProfileStoreItems(data);
-			} catch (error) {
-				console.error("Error fetching user:", error);
-			}
-		};
-
-		const fetchProfileLikedItems = async () => {
-			try {
-				const response = await fetch(`/api/user/${userId}/liked-items`);
-				if (!response.ok) {
-					throw new Error(response.statusText);
-				}
-				const data: StoreItem[] = await response.json();
-				setProfileLikedItems(data);
-			} catch (error) {
-				console.error("Error fetching user:", error);
-			}
-		};
-
 		const fetchForumPosts = async () => {
 			try {
 				const response = await fetch(`/api/user/${userId}/forum-posts`);
@@ -146,8 +169,8 @@ export default function Profile() {
 			setLoading(true);
 			await Promise.all([
 				fetchProfileUser(),
-				fetchProfileStoreItems(),
-				fetchProfileLikedItems(),
+				fetchProfileStoreItems(null),
+				fetchProfileLikedItems(null),
 				fetchForumPosts(),
 				fetchProfileStats(),
 			]);
@@ -308,6 +331,16 @@ export default function Profile() {
 								<StoreItemCard key={item.id} storeItem={item} />
 							))}
 						</div>
+						{storeItemsCursor && (
+							<div className="flex justify-center my-8">
+								<button
+									className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+									onClick={() => fetchProfileStoreItems(storeItemsCursor)}
+								>
+									Load More
+								</button>
+							</div>
+						)}
 					</TabsContent>
 					<TabsContent value="liked">
 						{profileLikedItems.length === 0 && (
@@ -318,6 +351,16 @@ export default function Profile() {
 								<StoreItemCard key={item.id} storeItem={item} />
 							))}
 						</div>
+						{likedItemsCursor && (
+							<div className="flex justify-center my-8">
+								<button
+									className="px-4 py-2 border border-black rounded hover:bg-gray-200 cursor-pointer dark:border-white dark:hover:bg-gray-800"
+									onClick={() => fetchProfileLikedItems(likedItemsCursor)}
+								>
+									Load More
+								</button>
+							</div>
+						)}
 					</TabsContent>
 					<TabsContent value="forum">
 						{forumPosts.length === 0 && (
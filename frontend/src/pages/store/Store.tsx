@@ -1,5 +1,6 @@
 import { StoreItemCard } from "@/pages/store/storeItemCard";
 import { StoreItem } from "@/types/StoreItem";
+import { Page } from "@/types/Page";
 import { useEffect, useState } from "react";
 
 import { Button } from "@/components/ui/button";
@@ -259,42 +260,46 @@ export default function Store() {
 	const [selectedConditions, setSelectedConditions] = useState<string[]>([]);
 	const [selectedGenders, setSelectedGenders] = useState<string[]>([]);
 	const [storeItems, setStoreItems] = useState<StoreItem[]>([]);
+	const [nextCursor, setNextCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
 
-	useEffect(() => {
-		// Fetch store items from the backend
-		const fetchStoreItems = async () => {
-			try {
-				setLoading(true);
-				const response = await fetch("/api/store-items");
-				const data = await response.json();
-				console.log("Fetched store items:", data);
-				setStoreItems(data);
-				setLoading(false);
-			} catch (error) {
-				console.error("Error fetching store items:", error);
-			} finally {
-				setLoading(false);
+	// Query string for the selected filters, e.g. "color=Blue&color=Black&category=Tops"
+	const filterParams = () => {
+		const params = new URLSearchParams();
+		selectedColors.forEach((color) => params.append("color", color));
+		selectedCategories.forEach((category) => params.append("category", category));
+		selectedConditions.forEach((condition) => params.append("condition", condition));
+		selectedGenders.forEach((gender) => params.append("gender", gender));
+		return params;
+	};
+
+	// Fetch a page of store items matching the filters from the backend,
+	// appending it after the current ones
+	const fetchStoreItems = async (cursor: string | null) => {
+		try {
+			const params = filterParams();
+			if (cursor) {
+				params.set("cursor", cursor);
 			}
-		};
+			const response = await fetch(`/api/store-items?${params.toString()}`);
+			const data: Page<StoreItem> = await response.json();
+			console.log("Fetched store items:", data);
+			setStoreItems((prev) => (cursor ? [...prev, ...data.items] : data.items));
+			setNextCursor(data.next_cursor);
+		} catch (error) {
+			console.error("Error fetching store items:", error);
+		}
+	};
 
-		fetchStoreItems();
-	}, []);
+	// Filters are applied by the backend: show items that match any selected groups, or all if none are selected
+	useEffect(() => {
+		const fetchFirstPage = async () => {
+			await fetchStoreItems(null);
+			setLoading(false);
+		};
 
-	// Filter Logic: Show items that match any selected groups, or all if none are selected
-	const filteredItems = storeItems.filter((item) => {
-		const colorMatch =
-			selectedColors.length === 0 || selectedColors.includes(item.color);
-		const categoryMatch =
-			selectedCategories.length === 0 ||
-			selectedCategories.includes(item.category);
-		const conditionMatch =
-			selectedConditions.length === 0 ||
-			selectedConditions.includes(item.condition);
-		const genderMatch =
-			selectedGenders.length === 0 || selectedGenders.includes(item.gender);
-		return colorMatch && categoryMatch && conditionMatch && genderMatch;
-	});
+		fetchFirstPage();
+	}, [selectedColors, selectedCategories, selectedConditions, selectedGenders]);
 
 	if (loading) {
 		return (
@@ -423,17 +428,30 @@ export default function Store() {
 				</div>
 
 				{/* Items */}
-				{filteredItems.length === 0 && (
+				{storeItems.length === 0 && (
 					<div className="text-2xl text-center">
 						No items found. Please try different filters.
 					</div>
 				)}
 
 				<div className="grid grid-cols-4">
-					{filteredItems.map((item, index) => (
+					{storeItems.map((item, index) => (
 						<StoreItemCard key={index} storeItem={item} />
 					))}
 				</div>
+
+				{nextCursor && (
+					<div className="flex justify-center my-8">
+						<Button
+							variant="outline"
+							size="lg"
+							className="text-base border-1 border-black"
+							onClick={() => fetchStoreItems(nextCursor)}
+						>
+							Load More
+						</Button>
+					</div>
+				)}
 			</div>
 		</div>
 	);
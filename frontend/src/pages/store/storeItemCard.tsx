@@ -12,7 +12,7 @@ export const StoreItemCard: React.FC<StoreItemCardProps> = ({ storeItem }) => {
 	const [heart, setHeart] = useState(storeItem.liked);
 	const [heartLoading, setHeartLoading] = useState(false);
 	const [likeCount, setLikeCount] = useState(storeItem.like_count);
-	const imageDataUrl = `data:image/jpeg;base64,${storeItem.picture_data}`;
+	const imageUrl = `${storeItem.picture_url}?size=card`;
 
 	const handleHeartClick = async () => {
 		if (heartLoading) return;
@@ -38,7 +38,7 @@ export const StoreItemCard: React.FC<StoreItemCardProps> = ({ storeItem }) => {
 			<Link to={`/item/${storeItem.id}`}>
 				<div className="relative h-72 w-full overflow-hidden rounded ring-2 ring-black shadow-gray-400 hover:shadow-lg transition-all duration-300 dark:shadow-transparent dark:hover:ring-3 dark:hover:ring-[#DB572C]">
 					<img
-						src={imageDataUrl}
+						src={imageUrl}
 						alt={storeItem.title}
 						className={`h-full w-full object-cover ${
 							storeItem.is_available ? "" : "filter brightness-80"
@@ -7,7 +7,7 @@ export interface OfferMade {
 	status: "Pending" | "Accepted" | "Declined" | "Completed" | "Cancelled";
 	item_title: string;
 	item_price: number;
-	item_picture_data: string;
+	item_picture_url: string;
 	seller_name: string;
 	seller_id: number;
 	seller_profile_picture_url: string;
@@ -7,7 +7,7 @@ export interface OfferReceived {
 	status: "Pending" | "Accepted" | "Declined" | "Completed" | "Cancelled";
 	item_title: string;
 	item_price: number;
-	item_picture_data: string;
+	item_picture_url: string;
 	buyer_name: string;
 	buyer_id: number;
 	buyer_profile_picture_url: string;
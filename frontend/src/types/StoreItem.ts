@@ -5,7 +5,7 @@ export interface StoreItem {
 	title: string;
 	description: string;
 	price: number;
-	picture_data: string;
+	picture_url: string;
 	category:
 		| "Jackets"
 		| "Tops"